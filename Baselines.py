@@ -0,0 +1,179 @@
+#The row-wise, per-route and positional implementations the vectorized steps replaced, kept as the references the tests
+#check those steps against and Benchmark.py times them against.
+#Dependencies: numpy, pandas
+
+import math
+import numpy as np
+import pandas as pd
+import DataAnalysis
+import DataExtraction
+import RouteTable
+import TripCube
+
+#The row-wise zone lookup formerly used by DataExtractionPostJuly2016, kept as our baseline.
+def findNYCZones(series,zoneLookup):
+    try:
+        series['pickup_borough'] = zoneLookup.iloc[series.PULocationID]['Borough']
+        series['pickup_neighborhood'] = zoneLookup.iloc[series.PULocationID]['Zone']
+        series['dropoff_borough'] = zoneLookup.iloc[series.DOLocationID]['Borough']
+        series['dropoff_neighborhood'] = zoneLookup.iloc[series.DOLocationID]['Zone']
+    except:
+        series['pickup_borough'] = 'NA'
+        series['pickup_neighborhood'] = 'NA'
+        series['dropoff_borough'] = 'NA'
+        series['dropoff_neighborhood'] = 'NA'
+    return series
+
+#The row-wise transformData formerly used by DataAnalysis, kept as our baseline.
+#pd.TimeGrouper('W') has since been removed from pandas, pd.Grouper(freq='W') is its replacement.
+def transformDataRowwise(df):
+    df = df.drop(['pickup_longitude','pickup_latitude','dropoff_longitude','dropoff_latitude'], axis = 1, errors = 'ignore')
+    df = df.apply(calcWeekMinutesRowwise,axis = 1)
+    gp = df.groupby([pd.Grouper(freq = 'W',key = 'pickup_datetime'),pd.cut(df.week_minutes,np.arange(0,7*24*60+DataAnalysis.intervalWeekMinutes,DataAnalysis.intervalWeekMinutes))])
+    df = gp.sum()
+    df['taxi_count'] = gp.size()
+    df = df.fillna(0)
+    df = df.apply(calcCarpoolsRowwise,axis = 1)
+    return(df)
+
+def calcWeekMinutesRowwise(series):
+    date = series.pickup_datetime
+    series['week_minutes'] = date.dayofweek*24*60 + date.hour*60 + date.minute
+    return series
+
+def calcCarpoolsRowwise(series):
+    if (series.taxi_count == 0):
+        series['carpool_count'] = 0   
+    elif (series.taxi_count == 1):
+        series['carpool_count'] = 1 
+    else:
+        carpoolCount = math.floor(series.passenger_count/DataAnalysis.carpoolGoal)
+        if carpoolCount == 0:
+            series['carpool_count'] = 1
+        else:
+            series['carpool_count'] = carpoolCount
+    return series
+
+#The per-route loop formerly used by DataAnalysis.findCommutes, kept as our baseline.
+def findCommutesPerRoute(df):
+    dfList = []
+    gp = df.groupby([df.pickup_neighborhood,df.dropoff_neighborhood], observed = True)
+    for key, item in gp:
+        transformed_df = DataAnalysis.transformData(gp.get_group(key))
+        transformed_df['pickup_neighborhood'] = key[0]
+        transformed_df['dropoff_neighborhood'] = key[1]
+        dfList.append(transformed_df)
+    return pd.concat(dfList)
+
+#The sliding window matching of DataAnalysis.matchWindows, one trip at a time, kept as our reference.
+def matchWindowsLoop(df, window):
+    rows = []
+    for route, dfRoute in df.groupby(DataAnalysis.routeColumns, observed = True):
+        dfRoute = dfRoute.sort_values('pickup_datetime', kind = 'stable')
+        departure = None
+        for trip in dfRoute.itertuples():
+            if departure is None or trip.pickup_datetime > departure + pd.Timedelta(minutes = window):
+                departure = trip.pickup_datetime + pd.Timedelta(minutes = window)
+                rows.append({'pickup_neighborhood':route[0], 'dropoff_neighborhood':route[1], 'pickup_datetime':departure,
+                             'passenger_count':0, 'taxi_count':0})
+            rows[-1]['passenger_count'] += trip.passenger_count
+            rows[-1]['taxi_count'] += 1
+    df = pd.DataFrame(rows)
+    df['carpool_count'] = DataAnalysis.calcCarpools(df['taxi_count'].values, df['passenger_count'].values)
+    return df
+
+#The clustering of DataAnalysis.clusterPoints, one point at a time, kept as our reference.
+def clusterPointsLoop(lon, lat, radius):
+    cells = [(math.floor(a*DataAnalysis.metersPerDegreeLon/radius), math.floor(b*DataAnalysis.metersPerDegreeLat/radius)) for a, b in zip(lon, lat)]
+    counts = {}
+    for cell in cells:
+        counts[cell] = counts.get(cell, 0) + 1
+    labels = []
+    for x, y in cells:
+        #The busiest neighbor, ties going to the first cell in row order
+        neighbors = [(counts[(x + dx, y + dy)], -(y + dy), -(x + dx)) for dy in [-1,0,1] for dx in [-1,0,1] if (x + dx, y + dy) in counts]
+        count, y, x = max(neighbors)
+        labels.append('{0:.5f},{1:.5f}'.format((-y + 0.5)*radius/DataAnalysis.metersPerDegreeLat, (-x + 0.5)*radius/DataAnalysis.metersPerDegreeLon))
+    return labels
+
+#Regions of interest the isin masks were written against
+Astoria = ['Astoria','Astoria Park']
+Midtown = ['Midtown Center','Midtown North','Midtown South','Midtown East']
+UpperEastSide = ['Upper East Side North','Upper East Side South']
+UpperManhattanLat = 40.76
+
+#The string isin masks formerly used by DataAnalysis.findRouteSets, kept as our baseline.
+def findRouteSetsIsin(df):
+    
+    dfAA = df[((df['dropoff_neighborhood'].isin(Astoria)) #Within Astoria 
+            & (df['pickup_neighborhood'].isin(Astoria)))] 
+    
+    dfAM = df[((df['pickup_neighborhood'].isin(Astoria)) #From Astoria to Manhattan
+            & (df['dropoff_borough'].isin(['Manhattan'])))] 
+    
+    dfMA = df[((df['dropoff_neighborhood'].isin(Astoria)) #From Manhattan to Astoria 
+            & (df['pickup_borough'].isin(['Manhattan'])))]       
+    
+    dfLU = df[((df['pickup_neighborhood'].isin(['LaGuardia Airport'])) #From LGA to Upper Manhattan 
+            & (df['dropoff_latitude'] >= UpperManhattanLat)
+            & (df['dropoff_borough'].isin(['Manhattan'])))]
+    
+    dfUL = df[((df['dropoff_neighborhood'].isin(['LaGuardia Airport'])) #From Upper Manhattan to LGA
+            & (df['pickup_latitude'] >= UpperManhattanLat)
+            & (df['pickup_borough'].isin(['Manhattan'])))]
+          
+    dfLA = df[((df['pickup_neighborhood'].isin(['LaGuardia Airport'])) #From LGA to Astoria 
+            & (df['dropoff_neighborhood'].isin(Astoria)))] 
+
+    dfAL = df[((df['dropoff_neighborhood'].isin(['LaGuardia Airport'])) #From Astoria to LGA
+            & (df['pickup_neighborhood'].isin(Astoria)))]
+    
+    dfUMid = df[((df['pickup_neighborhood'].isin(UpperEastSide)) #From Upper East Side to Midtown
+            & (df['dropoff_neighborhood'].isin(Midtown)))] 
+         
+    dfMidU = df[((df['dropoff_neighborhood'].isin(UpperEastSide)) #From Midtown to Upper East Side 
+            & (df['pickup_neighborhood'].isin(Midtown)))] 
+         
+    dfUU = df[((df['dropoff_neighborhood'].isin(UpperEastSide)) #Within Upper East Side 
+            & (df['pickup_neighborhood'].isin(UpperEastSide)))]
+
+    return {'AA':dfAA,
+            'AM':dfAM,
+            'MA':dfMA,
+            'LU':dfLU,
+            'UL':dfUL,
+            'LA':dfLA,
+            'AL':dfAL,
+            'UMid':dfUMid,
+            'MidU':dfMidU,
+            'UU':dfUU}
+
+#The extraction of trips before 2015 as it was, joining the filtered trips of the whole file to the rows of the trip_fare file
+#at the same positions, kept as our baseline.
+def readDataPositional(a_file, zones, chunksize = None):
+    schema = DataExtraction.detectSchema(a_file)
+    df_list = []
+    for df in DataExtraction.readSchema(a_file, schema, chunksize):
+        df = df.drop(['medallion','hack_license'], axis = 1)
+        df = DataExtraction.filterTrips(DataExtraction.locateTrips(df, schema, zones), zones['routes'])
+        df_list.append(DataExtraction.nameTrips(df, schema, zones))
+    dft = pd.concat(df_list)
+
+    fareFile = a_file.replace('data','fare')
+    fareSchema = DataExtraction.detectSchema(fareFile)
+    dff_list = []
+    for dff in DataExtraction.readSchema(fareFile, fareSchema, chunksize):
+        dff = dff.drop(DataExtraction.fareKeyColumns, axis = 1)
+        dff_list.append(dff[dff.index.isin(dft.index)])
+    return dft.join(pd.concat(dff_list), how = 'inner')
+
+#The cubes of the route sets of DataAnalysis binned from copies of their trips, as they used to be, kept as our baseline
+def buildCubesFromCopies(df):
+    routes = RouteTable.loadRoutes()
+    bits = RouteTable.classifyNamedTrips(df, routes)
+    routeSets = {name:df[RouteTable.onRoute(bits, routes, name)] for name in routes['names']}
+    shifted = [routeSets[name].assign(pickup_datetime = routeSets[name].pickup_datetime + pd.Timedelta(minutes = minutes),
+                                      pickup_neighborhood = 'Astoria')
+               for name, minutes in [('LU', DataAnalysis.LGAtoAstoria), ('UL', DataAnalysis.UpperManhattanToAstoria)]]
+    routeSets['AAll'] = pd.concat(shifted + [routeSets[name] for name in ['AM','MA','LA','AL']])
+    return {key:TripCube.buildCube(routeSets[key]) for key in ['AA','AM','MA','AAll','UMid','MidU','UU']}
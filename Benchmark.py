@@ -0,0 +1,609 @@
+#Benchmarks of the extraction and analysis stages against the row-wise implementations they replaced.
+#Dependencies: pandas, numpy, nyc.gov zone lookup .csv
+#Command Line Arguments: name of the benchmark, followed by its own arguments:
+#    zones [path to a post July 2016 yellow .csv, relative to this script] [number of rows to time row-wise]
+#    transform [number of trips]
+#    commutes [number of trips]
+#    cube [number of trips]
+#    windows [number of trips over a year] [window in minutes]
+#    clusters [number of trips] [radius in meters]
+#    routes [number of trips]
+#    schema [number of trips]
+#    datetimes [number of trips]
+#    fares [number of trips] [number of trips per chunk]
+#    compressed [path to a compressed .csv, relative to this script] [number of trips per chunk]
+#    startup [number of random points to check]
+#    views [number of trips]
+#    outofcore [number of months] [number of trips per month]
+#    suite [numbers of trips...]
+#Without a .csv, the zones benchmark runs on 5 million random LocationIDs, about the size of a yellow cab month.
+#The transform, commutes and cube benchmarks run on random trips over the routes of the AAll route set, and check that the
+#vectorized transformData, single pass findCommutes and sparse TripCube give the same results as the versions they replaced.
+#The windows benchmark checks sliding window matching against a trip by trip loop, and times it on a year of trips.
+#The clusters benchmark checks clustering by coordinates against a point by point loop, and times it on random coordinates.
+#The routes benchmark checks the route table against the isin masks it replaced, on trips between random zones.
+#The schema benchmark measures the memory of trips in their compact TripSchema types, versus strings and float64 columns.
+#The datetimes benchmark times parsing datetimes in nyc.gov's format on ingestion versus inferring it after loading.
+#The fares benchmark checks the key-based lockstep join of trips before 2015 to their fares against the positional join
+#it replaced, on a synthetic trip_data/trip_fare pair, and measures the time and peak memory of either.
+#The compressed benchmark times reading a compressed file through pandas' own decompression, which decompresses and parses
+#in turn, versus CompressedFiles' background decompression, and checks that both read the same trips.
+#The startup benchmark times a fresh process loading the zones from the shapefile through OGR versus memory mapping the
+#compiled zones, and checks that both locate random points in NYC alike.
+#The views benchmark bins the route sets of DataAnalysis into cubes from copies of their trips, as they used to be,
+#versus from views of the one frame of trips, and checks that both give the same cubes.
+#The outofcore benchmark analyzes synthetic months of processed trips read all at once, versus one month at a time into
+#partial cubes which are then merged, and again reusing those partial cubes, and checks that all give the same cubes.
+#The suite times geocoding, route filtering, transformData, findCommutes and analyzeMetaData on trips from SyntheticTrips,
+#by default at 1e5, 1e6 and 1e7 trips, and appends the timings to benchmarkResults.csv along with the commit they were
+#measured at. Timings more than regressionTolerance times slower than the best recorded for the same stage and size are
+#flagged as regressions.
+
+import pandas as pd
+import numpy as np
+import time
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import tracemalloc
+import ZoneGeocoder
+import Baselines
+import CompressedFiles
+import DataAnalysis
+import DataExtraction
+import RouteTable
+import SyntheticTrips
+import TripSchema
+import TripCube
+
+filePath = os.path.dirname(os.path.realpath(__file__))
+taxiZoneLookupPath = filePath + '/geographicData/taxi_zone_lookup.csv'
+taxiShapefilePath = filePath + '/geographicData/taxi_zones/taxi_zones.shp'
+benchmarkResultsPath = filePath + '/benchmarkResults.csv'
+
+#Numbers of trips the suite is run at
+suiteSizes = [100000, 1000000, 10000000]
+
+#Timings this many times slower than the best recorded are flagged as regressions
+regressionTolerance = 1.25
+
+#Rows in a typical monthly yellow cab file
+monthRows = 5000000
+
+
+#Times naming the pickup and dropoff zones of a whole file, row-wise versus the vectorized LocationID join.
+#The row-wise version is only run on the first rowwiseRows trips and extrapolated to the whole file.
+def benchmarkZoneJoin(tripFile = None, rowwiseRows = 20000):
+    if tripFile is None:
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'PULocationID':rng.integers(1, 266, monthRows),
+                           'DOLocationID':rng.integers(1, 266, monthRows)})
+    else:
+        df = pd.read_csv(tripFile, index_col=False, header=0, usecols=['PULocationID','DOLocationID'])
+    print('Naming zones of ' + str(len(df)) + ' trips...')
+
+    zoneLookup = pd.read_csv(taxiZoneLookupPath, index_col = 0, header=0)
+    sample = df.iloc[:rowwiseRows].copy()
+    start = time.time()
+    sample.apply(Baselines.findNYCZones,args=(zoneLookup,),axis = 1)
+    rowwiseSeconds = (time.time() - start)*len(df)/len(sample)
+
+    start = time.time()
+    zones = ZoneGeocoder.loadZoneLookup(taxiZoneLookupPath)
+    df['pickup_borough'], df['pickup_neighborhood'] = ZoneGeocoder.zoneNames(df['PULocationID'].values, zones)
+    df['dropoff_borough'], df['dropoff_neighborhood'] = ZoneGeocoder.zoneNames(df['DOLocationID'].values, zones)
+    vectorizedSeconds = time.time() - start
+
+    print('Row-wise apply: {0:0.1f} seconds per file (extrapolated from {1} rows)'.format(rowwiseSeconds, len(sample)) + '\n' +
+          'Vectorized join: {0:0.2f} seconds per file'.format(vectorizedSeconds) + '\n' +
+          'Speedup: {0:0.0f}x'.format(rowwiseSeconds/vectorizedSeconds))
+    return {'rows':len(df), 'rowwise_seconds':rowwiseSeconds, 'vectorized_seconds':vectorizedSeconds}
+
+
+#Times transformData over every route of the AAll route set, row-wise versus vectorized,
+#and checks that both give the same sums, taxi counts and carpool counts.
+def benchmarkTransform(rows = 20000):
+    df = SyntheticTrips.syntheticAAll(rows)
+    print('Transforming ' + str(len(df)) + ' trips over ' + str(df.groupby(['pickup_neighborhood','dropoff_neighborhood'], observed = True).ngroups) + ' routes...')
+    gp = df.groupby(['pickup_neighborhood','dropoff_neighborhood'], observed = True)
+
+    start = time.time()
+    rowwise = [Baselines.transformDataRowwise(group.drop(['pickup_neighborhood','dropoff_neighborhood'], axis = 1)) for key, group in gp]
+    rowwiseSeconds = time.time() - start
+
+    start = time.time()
+    vectorized = [DataAnalysis.transformData(group) for key, group in gp]
+    vectorizedSeconds = time.time() - start
+
+    columns = ['passenger_count','trip_distance','fare_amount','week_minutes','taxi_count','carpool_count']
+    for (key, group), expected, result in zip(gp, rowwise, vectorized):
+        #Older pandas kept empty intervals as rows of zeros, which add nothing to any metric
+        expected = expected[expected['taxi_count'] > 0]
+        pd.testing.assert_frame_equal(result[columns], expected[columns], check_dtype = False, check_index_type = False, check_categorical = False)
+    print('Row-wise and vectorized transformData agree on all ' + str(len(vectorized)) + ' routes')
+
+    print('Row-wise apply: {0:0.2f} seconds'.format(rowwiseSeconds) + '\n' +
+          'Vectorized: {0:0.3f} seconds'.format(vectorizedSeconds) + '\n' +
+          'Speedup: {0:0.0f}x'.format(rowwiseSeconds/vectorizedSeconds))
+    return {'rows':len(df), 'rowwise_seconds':rowwiseSeconds, 'vectorized_seconds':vectorizedSeconds}
+
+
+#Times findCommutes over the AAll route set, looping through routes versus a single groupby,
+#and checks that both give the same intervals for every route.
+def benchmarkCommutes(rows = 1000000):
+    df = SyntheticTrips.syntheticAAll(rows)
+    print('Finding commutes of ' + str(len(df)) + ' trips...')
+
+    start = time.time()
+    perRoute = Baselines.findCommutesPerRoute(df)
+    perRouteSeconds = time.time() - start
+
+    start = time.time()
+    singlePass = DataAnalysis.findCommutes(df)
+    singlePassSeconds = time.time() - start
+
+    def comparable(result):
+        result = result.rename(columns = {'week_minutes':'week_minutes_sum'}).reset_index()
+        return result.astype({'week_minutes':str, 'pickup_neighborhood':str, 'dropoff_neighborhood':str})
+    pd.testing.assert_frame_equal(comparable(singlePass), comparable(perRoute), check_dtype = False)
+    print('Per-route and single pass findCommutes agree on all ' + str(len(singlePass)) + ' intervals')
+
+    print('Per-route loop: {0:0.2f} seconds'.format(perRouteSeconds) + '\n' +
+          'Single groupby: {0:0.2f} seconds'.format(singlePassSeconds) + '\n' +
+          'Speedup: {0:0.0f}x'.format(perRouteSeconds/singlePassSeconds))
+    return {'rows':len(df), 'per_route_seconds':perRouteSeconds, 'single_pass_seconds':singlePassSeconds}
+
+#Times aggregating the AAll route set into a TripCube and computing its metadata, versus findCommutes and
+#analyzeMetaData, and checks that the cube's occupied cells are the intervals findCommutes gives.
+def benchmarkCube(rows = 1000000):
+    df = SyntheticTrips.syntheticAAll(rows)
+    print('Aggregating ' + str(len(df)) + ' trips...')
+
+    start = time.time()
+    commutes = DataAnalysis.analyzeMetaData(DataAnalysis.findCommutes(df))
+    commutesSeconds = time.time() - start
+
+    start = time.time()
+    cube = TripCube.buildCube(df)
+    TripCube.analyzeCube(cube)
+    cubeSeconds = time.time() - start
+
+    def comparable(result):
+        result = result.drop('week_minutes', axis = 1, errors = 'ignore').reset_index()
+        return result.astype({'week_minutes':str, 'pickup_neighborhood':str, 'dropoff_neighborhood':str})
+    cells = comparable(TripCube.cubeToFrame(cube))
+    pd.testing.assert_frame_equal(cells, comparable(commutes)[cells.columns], check_dtype = False)
+    print('findCommutes and the cube agree on all ' + str(len(cells)) + ' intervals, ' +
+          'held in {0} cells taking {1:0.1f} MB'.format(len(cube['cell']), sum(cube[column].nbytes for column in ['cell'] + TripCube.cubeColumns)/1e6))
+
+    print('findCommutes and analyzeMetaData: {0:0.2f} seconds'.format(commutesSeconds) + '\n' +
+          'TripCube: {0:0.2f} seconds'.format(cubeSeconds) + '\n' +
+          'Speedup: {0:0.1f}x'.format(commutesSeconds/cubeSeconds))
+    return {'rows':len(df), 'commutes_seconds':commutesSeconds, 'cube_seconds':cubeSeconds}
+
+
+#Checks sliding window matching against the trip by trip loop on a month of trips, then times it on rows trips over a year,
+#compared with fixed intervals of the same width.
+def benchmarkWindows(rows = 1000000, window = 7):
+    df = SyntheticTrips.syntheticAAll(20000)
+    columns = ['pickup_neighborhood','dropoff_neighborhood','pickup_datetime','passenger_count','taxi_count','carpool_count']
+    vectorized = DataAnalysis.transformData(df, DataAnalysis.routeColumns, window).reset_index()[columns]
+    loop = Baselines.matchWindowsLoop(df, window)[columns]
+    pd.testing.assert_frame_equal(vectorized.astype({'pickup_neighborhood':str, 'dropoff_neighborhood':str}), loop, check_dtype = False)
+    print('Sliding windows and the trip by trip loop agree on all ' + str(len(loop)) + ' departures')
+
+    df = pd.concat([SyntheticTrips.syntheticAAll(rows//12, '2016-{0:02d}'.format(month)) for month in range(1, 13)], ignore_index = True)
+    print('Matching ' + str(len(df)) + ' trips over a year...')
+    start = time.time()
+    windows = DataAnalysis.transformData(df, DataAnalysis.routeColumns, window)
+    windowSeconds = time.time() - start
+
+    intervalWeekMinutes = DataAnalysis.intervalWeekMinutes
+    DataAnalysis.intervalWeekMinutes = 2*window
+    start = time.time()
+    intervals = DataAnalysis.transformData(df, DataAnalysis.routeColumns)
+    intervalSeconds = time.time() - start
+    DataAnalysis.intervalWeekMinutes = intervalWeekMinutes
+
+    print('Fixed {0} minute intervals: {1} carpools for {2} taxis, {3:0.2f} seconds'.format(2*window, intervals['carpool_count'].sum(), intervals['taxi_count'].sum(), intervalSeconds) + '\n' +
+          'Sliding +/-{0} minute windows: {1} carpools for {2} taxis, {3:0.2f} seconds'.format(window, windows['carpool_count'].sum(), windows['taxi_count'].sum(), windowSeconds))
+    return {'rows':len(df), 'window_seconds':windowSeconds, 'interval_seconds':intervalSeconds}
+
+
+#Checks clustering by coordinates against the point by point loop, then times clusterTrips on rows trips
+#and findCommutes between their clusters.
+def benchmarkClusters(rows = 10000000, radius = DataAnalysis.clusterRadius):
+    df = SyntheticTrips.syntheticCoordinates(SyntheticTrips.syntheticAAll(20000))
+    lon, lat = df['pickup_longitude'].values, df['pickup_latitude'].values
+    labels, cluster = DataAnalysis.clusterPoints(lon, lat, radius)
+    loop = Baselines.clusterPointsLoop(lon, lat, radius)
+    if [labels[i] for i in cluster] != loop:
+        raise Exception("ERROR: clusterPoints and the point by point loop disagree.")
+    print('clusterPoints and the point by point loop agree on all ' + str(len(loop)) + ' points, in ' + str(len(labels)) + ' clusters')
+
+    df = SyntheticTrips.syntheticCoordinates(SyntheticTrips.syntheticAAll(rows))
+    print('Clustering ' + str(len(df)) + ' trips...')
+    start = time.time()
+    clustered = DataAnalysis.clusterTrips(df, radius)
+    clusterSeconds = time.time() - start
+    print('{0} clusters of pickups and dropoffs, {1:0.2f} seconds'.format(len(clustered['pickup_cluster'].cat.categories), clusterSeconds))
+
+    df = df.iloc[:1000000]
+    start = time.time()
+    commutes = DataAnalysis.findCommutes(df, radius = radius)
+    commutesSeconds = time.time() - start
+    print('findCommutes between the clusters of ' + str(len(df)) + ' trips: {0} carpools for {1} taxis, {2:0.2f} seconds'.format(
+          commutes['carpool_count'].sum(), commutes['taxi_count'].sum(), commutesSeconds))
+    return {'rows':rows, 'cluster_seconds':clusterSeconds, 'commutes_seconds':commutesSeconds}
+
+
+#Times separating trips into route sets with string isin masks versus the route table,
+#and checks that both give the same trips for every route.
+def benchmarkRoutes(rows = 5000000):
+    df = SyntheticTrips.syntheticZoneTrips(rows)
+    print('Classifying ' + str(len(df)) + ' trips...')
+    start = time.time()
+    isin = Baselines.findRouteSetsIsin(df)
+    isinSeconds = time.time() - start
+
+    start = time.time()
+    table = DataAnalysis.findRouteSets(df)
+    tableSeconds = time.time() - start
+
+    for name in isin:
+        pd.testing.assert_frame_equal(DataAnalysis.viewTrips(df, table[name]), isin[name])
+    print('The route table and isin masks agree on all ' + str(sum(len(isin[name]) for name in isin)) + ' trips of ' + str(len(isin)) + ' routes')
+
+    print('isin masks: {0:0.2f} seconds'.format(isinSeconds) + '\n' +
+          'Route table: {0:0.2f} seconds'.format(tableSeconds) + '\n' +
+          'Speedup: {0:0.1f}x'.format(isinSeconds/tableSeconds))
+    return {'rows':len(df), 'isin_seconds':isinSeconds, 'table_seconds':tableSeconds}
+
+
+#Measures the memory of rows trips as read by DataAnalysis.readFiles, in the object strings and float64 columns
+#the processed frames used to hold, versus their compact TripSchema types.
+def benchmarkSchema(rows = 10000000):
+    df = SyntheticTrips.syntheticCoordinates(SyntheticTrips.syntheticAAll(rows))
+    df['pickup_borough'] = np.where(df['pickup_neighborhood'].isin(['LaGuardia Airport','Astoria','Astoria Park']), 'Queens', 'Manhattan')
+    df['dropoff_borough'] = np.where(df['dropoff_neighborhood'].isin(['LaGuardia Airport','Astoria','Astoria Park']), 'Queens', 'Manhattan')
+    df = df[DataAnalysis.analysisColumns]
+    legacy = df.astype({'passenger_count':np.int64, 'trip_distance':np.float64, 'pickup_latitude':np.float64, 'dropoff_latitude':np.float64,
+                        'pickup_borough':object, 'pickup_neighborhood':object, 'dropoff_borough':object, 'dropoff_neighborhood':object})
+    legacy['fare_amount'] = df['fare_amount']/100
+
+    start = time.time()
+    compact = TripSchema.compactTrips(legacy.copy())
+    compactSeconds = time.time() - start
+    if not (compact['fare_amount'] == df['fare_amount']).all():
+        raise Exception("ERROR: fares changed when converted to cents.")
+
+    legacyBytes = legacy.memory_usage(deep = True).sum()
+    compactBytes = compact.memory_usage(deep = True).sum()
+    print('Strings and float64: {0:0.1f} bytes per trip, {1:0.0f} MB'.format(legacyBytes/len(df), legacyBytes/1e6) + '\n' +
+          'Compact types: {0:0.1f} bytes per trip, {1:0.0f} MB, converted in {2:0.2f} seconds'.format(compactBytes/len(df), compactBytes/1e6, compactSeconds) + '\n' +
+          'Reduction: {0:0.1f}x'.format(legacyBytes/compactBytes))
+    return {'rows':len(df), 'legacy_bytes':int(legacyBytes), 'compact_bytes':int(compactBytes)}
+
+
+#Times parsing a month of pickup datetimes as TripSchema.parseDatetimes does on ingestion, versus the format inferring
+#pd.to_datetime readFiles used to call on the loaded strings, and measures the memory of either.
+def benchmarkDatetimes(rows = 5000000):
+    strings = SyntheticTrips.syntheticAAll(rows)['pickup_datetime'].astype(str).astype(object)
+    print('Parsing ' + str(len(strings)) + ' datetimes...')
+
+    start = time.time()
+    inferred = pd.to_datetime(strings)
+    inferredSeconds = time.time() - start
+
+    start = time.time()
+    parsed = TripSchema.parseDatetimes(strings)
+    parsedSeconds = time.time() - start
+    if not (parsed == inferred).all():
+        raise Exception("ERROR: parsed and inferred datetimes disagree.")
+
+    print('Inferred format: {0:0.2f} seconds'.format(inferredSeconds) + '\n' +
+          'Fixed format: {0:0.2f} seconds'.format(parsedSeconds) + '\n' +
+          'Strings: {0:0.1f} bytes per trip, datetime64: {1:0.1f} bytes per trip'.format(strings.memory_usage(deep = True)/len(strings), parsed.memory_usage(deep = True)/len(parsed)))
+    return {'rows':len(strings), 'inferred_seconds':inferredSeconds, 'parsed_seconds':parsedSeconds}
+
+
+#Seconds and peak megabytes allocated by a call, as traced by tracemalloc
+def traceCall(func, *args):
+    tracemalloc.start()
+    start = time.time()
+    result = func(*args)
+    seconds = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]/1e6
+    tracemalloc.stop()
+    return result, seconds, peak
+
+#Joins a synthetic month of trips before 2015 to their fares, by position versus by key in lockstep chunks,
+#and checks that both give the same trips.
+def benchmarkFares(rows = 1000000, chunksize = 100000):
+    folder = tempfile.mkdtemp()
+    try:
+        sampler = SyntheticTrips.loadZoneSampler()
+        tripFile = SyntheticTrips.generateFile(folder, 'Pre2015', rows, sampler, np.random.default_rng(0))[0]
+        zones = ZoneGeocoder.loadZones(taxiShapefilePath, taxiZoneLookupPath)
+        zones['routes'] = RouteTable.loadRoutes()
+        print('Joining ' + str(rows) + ' trips to their fares, ' + str(chunksize) + ' at a time...')
+
+        positional, positionalSeconds, positionalPeak = traceCall(Baselines.readDataPositional, tripFile, zones, chunksize)
+        keyed, keyedSeconds, keyedPeak = traceCall(DataExtraction.readData, tripFile, None, zones, chunksize)
+    finally:
+        shutil.rmtree(folder)
+
+    pd.testing.assert_frame_equal(keyed.reset_index(drop = True), positional.reset_index(drop = True))
+    print('Positional and keyed joins agree on all ' + str(len(keyed)) + ' trips')
+
+    print('Positional join: {0:0.2f} seconds, {1:0.0f} MB peak'.format(positionalSeconds, positionalPeak) + '\n' +
+          'Keyed lockstep join: {0:0.2f} seconds, {1:0.0f} MB peak'.format(keyedSeconds, keyedPeak))
+    return {'rows':rows, 'positional_seconds':positionalSeconds, 'keyed_seconds':keyedSeconds,
+            'positional_peak_mb':positionalPeak, 'keyed_peak_mb':keyedPeak}
+
+#Reads a compressed .csv chunk by chunk with pandas' decompression versus CompressedFiles.openStream.
+def benchmarkCompressed(compressedFile, chunksize = 1000000):
+    print('Reading ' + compressedFile + ', ' + str(chunksize) + ' trips at a time...')
+    start = time.time()
+    inline = [len(df) for df in pd.read_csv(compressedFile, chunksize = chunksize, dtype = str)]
+    inlineSeconds = time.time() - start
+
+    start = time.time()
+    with CompressedFiles.openStream(compressedFile) as source:
+        streamed = [len(df) for df in pd.read_csv(source, chunksize = chunksize, dtype = str)]
+    streamedSeconds = time.time() - start
+    if streamed != inline:
+        raise Exception("ERROR: the streamed file has different chunks than pandas read.")
+
+    print('Both read ' + str(sum(inline)) + ' trips' + '\n' +
+          'Pandas decompression: {0:0.2f} seconds'.format(inlineSeconds) + '\n' +
+          'Background decompression: {0:0.2f} seconds'.format(streamedSeconds) + '\n' +
+          'Speedup: {0:0.2f}x'.format(inlineSeconds/streamedSeconds))
+    return {'rows':sum(inline), 'inline_seconds':inlineSeconds, 'streamed_seconds':streamedSeconds}
+
+
+#The cubes of the route sets of DataAnalysis binned from views of the one frame of trips, as they are now
+def buildCubesFromViews(df):
+    routeSets = DataAnalysis.findRouteSets(df)
+    routeSets['AAll'] = DataAnalysis.findCommuteAirport(routeSets)
+    return {key:TripCube.buildCube(df, view = routeSets[key]) for key in ['AA','AM','MA','AAll','UMid','MidU','UU']}
+
+#Bins the route sets of rows trips into cubes from copies versus views, and checks that both give the same cubes.
+def benchmarkViews(rows = 1000000):
+    sampler = SyntheticTrips.loadZoneSampler()
+    zones = ZoneGeocoder.loadZoneLookup(taxiZoneLookupPath)
+    df = SyntheticTrips.syntheticTrips(rows, '2015-01', sampler, np.random.default_rng(0), routeShare = 1)
+    df['pickup_borough'], df['pickup_neighborhood'] = ZoneGeocoder.zoneNames(df['PULocationID'].values, zones)
+    df['dropoff_borough'], df['dropoff_neighborhood'] = ZoneGeocoder.zoneNames(df['DOLocationID'].values, zones)
+    df = TripSchema.compactTrips(df[DataAnalysis.analysisColumns])
+    print('Binning the route sets of ' + str(len(df)) + ' trips...')
+
+    copies, copiesSeconds, copiesPeak = traceCall(Baselines.buildCubesFromCopies, df)
+    views, viewsSeconds, viewsPeak = traceCall(buildCubesFromViews, df)
+    for key in copies:
+        pd.testing.assert_frame_equal(views[key]['routes'].astype(str), copies[key]['routes'].astype(str))
+        pd.testing.assert_index_equal(views[key]['weeks'], copies[key]['weeks'])
+        for column in ['cell'] + TripCube.cubeColumns:
+            np.testing.assert_array_equal(views[key][column], copies[key][column])
+    print('Copies and views agree on the cubes of all ' + str(len(copies)) + ' route sets, ' +
+          str(sum(int(cube['taxi_count'].sum()) for cube in copies.values())) + ' trips in all')
+
+    print('Copied route sets: {0:0.2f} seconds, {1:0.0f} MB peak'.format(copiesSeconds, copiesPeak) + '\n' +
+          'Route set views: {0:0.2f} seconds, {1:0.0f} MB peak'.format(viewsSeconds, viewsPeak))
+    return {'rows':rows, 'copies_seconds':copiesSeconds, 'views_seconds':viewsSeconds,
+            'copies_peak_mb':copiesPeak, 'views_peak_mb':viewsPeak}
+
+#Writes months of synthetic trips in 2015, in the layout and types of the processed trips, into folder
+def writeProcessedMonths(folder, months, rows):
+    sampler = SyntheticTrips.loadZoneSampler()
+    zones = ZoneGeocoder.loadZoneLookup(taxiZoneLookupPath)
+    for month in range(1, months + 1):
+        df = SyntheticTrips.syntheticTrips(rows, '2015-{0:02d}'.format(month), sampler, np.random.default_rng(month), routeShare = 1)
+        df['pickup_borough'], df['pickup_neighborhood'] = ZoneGeocoder.zoneNames(df['PULocationID'].values, zones)
+        df['dropoff_borough'], df['dropoff_neighborhood'] = ZoneGeocoder.zoneNames(df['DOLocationID'].values, zones)
+        monthFolder = os.path.join(folder, 'color=yellow', 'year=2015', 'month={0:02d}'.format(month))
+        os.makedirs(monthFolder)
+        TripSchema.compactTrips(df[DataAnalysis.analysisColumns]).to_parquet(
+            os.path.join(monthFolder, 'yellow_tripdata_2015-{0:02d}-0.parquet'.format(month)), index = False)
+
+#The cubes of every route set of the processed trips, read all at once
+def analyzeInMemory():
+    df = DataAnalysis.readFiles()
+    views = DataAnalysis.routeSetViews(df)
+    return {key:TripCube.buildCube(df, view = views[key]) for key in views}
+
+#The cubes of every route set merged from the partial cubes of each processed file, built or reused from partialsFolder
+def analyzeOutOfCore(partialsFolder):
+    partials = [TripCube.buildPartialCubes(path, partialsFolder) for path in DataAnalysis.processedFiles()]
+    return {key:TripCube.mergeCubes([TripCube.loadCube(partial[key]) for partial in partials]) for key in partials[0]}
+
+#Analyzes months of synthetic processed trips in memory versus out of core, and checks that both give the same cubes.
+def benchmarkOutOfCore(months = 6, rows = 1000000):
+    folder = tempfile.mkdtemp()
+    cleanedTripPath = DataAnalysis.cleanedTripPath
+    try:
+        DataAnalysis.cleanedTripPath = os.path.join(folder, 'trips')
+        writeProcessedMonths(DataAnalysis.cleanedTripPath, months, rows)
+        print('Analyzing ' + str(months) + ' months of ' + str(rows) + ' trips...')
+        inMemory, inMemorySeconds, inMemoryPeak = traceCall(analyzeInMemory)
+        outOfCore, outOfCoreSeconds, outOfCorePeak = traceCall(analyzeOutOfCore, os.path.join(folder, 'partials'))
+        reused, reusedSeconds, reusedPeak = traceCall(analyzeOutOfCore, os.path.join(folder, 'partials'))
+    finally:
+        DataAnalysis.cleanedTripPath = cleanedTripPath
+        shutil.rmtree(folder)
+
+    for merged in [outOfCore, reused]:
+        for key in inMemory:
+            pd.testing.assert_frame_equal(merged[key]['routes'].astype(str), inMemory[key]['routes'].astype(str))
+            pd.testing.assert_index_equal(merged[key]['weeks'], inMemory[key]['weeks'])
+            for column in ['cell'] + TripCube.cubeColumns:
+                np.testing.assert_array_equal(merged[key][column], inMemory[key][column])
+    print('In memory and out of core analyses agree on the cubes of all ' + str(len(inMemory)) + ' route sets')
+
+    print('In memory: {0:0.2f} seconds, {1:0.0f} MB peak'.format(inMemorySeconds, inMemoryPeak) + '\n' +
+          'Out of core: {0:0.2f} seconds, {1:0.0f} MB peak'.format(outOfCoreSeconds, outOfCorePeak) + '\n' +
+          'Out of core, reusing partial cubes: {0:0.2f} seconds, {1:0.0f} MB peak'.format(reusedSeconds, reusedPeak))
+    return {'months':months, 'rows':rows, 'in_memory_seconds':inMemorySeconds, 'out_of_core_seconds':outOfCoreSeconds,
+            'reused_seconds':reusedSeconds, 'in_memory_peak_mb':inMemoryPeak, 'out_of_core_peak_mb':outOfCorePeak}
+
+#Seconds a fresh process takes to run the given statement once ZoneGeocoder is imported, and whether it imported OGR
+def timeZoneStartup(statement):
+    script = ('import sys, time\nimport ZoneGeocoder\nstart = time.perf_counter()\n' + statement +
+              '\nprint(time.perf_counter() - start, "ogr" in sys.modules)')
+    output = subprocess.run([sys.executable, '-c', script, taxiShapefilePath, taxiZoneLookupPath], cwd = filePath,
+                            check = True, capture_output = True, text = True).stdout.split()
+    return float(output[-2]), output[-1] == 'True'
+
+#Times loading the zones from the shapefile versus the compiled zones, and checks that both locate random points alike.
+def benchmarkZoneStartup(points = 1000000):
+    fromShapefile = ('polygons, locationIDs = ZoneGeocoder.readZonePolygons(sys.argv[1])\n'
+                     'ZoneGeocoder.buildZones(polygons, locationIDs, ZoneGeocoder.loadZoneLookup(sys.argv[2]))')
+    compiled = 'ZoneGeocoder.loadCompiledZones(sys.argv[1], sys.argv[2])'
+    ZoneGeocoder.loadCompiledZones(taxiShapefilePath, taxiZoneLookupPath) #Compiled beforehand, if need be
+    for name, statement in [('shapefile', fromShapefile), ('compiled', compiled)]:
+        seconds, ogr = timeZoneStartup(statement)
+        print('Loading zones from the {0:<10} took {1:0.3f} seconds{2}'.format(name, seconds, ', importing OGR' if ogr else ''))
+
+    polygons, locationIDs = ZoneGeocoder.readZonePolygons(taxiShapefilePath)
+    zones = ZoneGeocoder.buildZones(polygons, locationIDs, ZoneGeocoder.loadZoneLookup(taxiZoneLookupPath))
+    compiledZones = ZoneGeocoder.loadCompiledZones(taxiShapefilePath, taxiZoneLookupPath)
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(ZoneGeocoder.NYCW, ZoneGeocoder.NYCE, points)
+    lat = rng.uniform(ZoneGeocoder.NYCS, ZoneGeocoder.NYCN, points)
+    found = ZoneGeocoder.locateZonesExact(lon, lat, zones)
+    if not (ZoneGeocoder.locateZonesExact(lon, lat, compiledZones) == found).all():
+        raise Exception("ERROR: the compiled zones locate points differently than the shapefile.")
+    for column in ['boroughCategories','boroughCodes','neighborhoodCategories','neighborhoodCodes']:
+        if not np.array_equal(np.asarray(compiledZones[column]), np.asarray(zones[column])):
+            raise Exception("ERROR: the compiled zone lookup differs in " + column + ".")
+    print('The compiled zones locate all ' + str(points) + ' random points and name their zones alike.')
+
+#Times each stage of the pipeline on rows trips of January 2015 from SyntheticTrips, whose coordinates lie in the zones
+#they were drawn from. Geocoding is checked to find those zones.
+#The analysis stages run on the trips left by the route filter.
+def benchmarkStages(rows, sampler, zones, routes):
+    df = SyntheticTrips.syntheticTrips(rows, '2015-01', sampler, np.random.default_rng(0))
+    drawn = df[DataExtraction.locationIDColumns].values
+    df = df[['pickup_datetime','passenger_count','trip_distance','fare_amount'] + DataExtraction.coordinateColumns]
+    timings = []
+
+    start = time.time()
+    df['PULocationID'] = ZoneGeocoder.locateZones(df['pickup_longitude'].values, df['pickup_latitude'].values, zones)
+    df['DOLocationID'] = ZoneGeocoder.locateZones(df['dropoff_longitude'].values, df['dropoff_latitude'].values, zones)
+    timings.append(('geocode', len(df), time.time() - start))
+    agreement = (df[DataExtraction.locationIDColumns].values == drawn).mean()
+    if agreement < 0.999:
+        raise Exception("ERROR: only {0:0.2%} of the synthetic coordinates were geocoded to the zones they were drawn in.".format(agreement))
+    del drawn
+
+    start = time.time()
+    filtered = DataExtraction.filterTrips(df, routes)
+    timings.append(('filter', len(df), time.time() - start))
+    del df
+
+    df = filtered
+    df['pickup_borough'], df['pickup_neighborhood'] = ZoneGeocoder.zoneNames(df['PULocationID'].values, zones)
+    df['dropoff_borough'], df['dropoff_neighborhood'] = ZoneGeocoder.zoneNames(df['DOLocationID'].values, zones)
+    df = TripSchema.compactTrips(df[DataAnalysis.analysisColumns])
+
+    start = time.time()
+    DataAnalysis.transformData(df, DataAnalysis.routeColumns)
+    timings.append(('transform', len(df), time.time() - start))
+
+    start = time.time()
+    commutes = DataAnalysis.findCommutes(df)
+    timings.append(('commutes', len(df), time.time() - start))
+
+    start = time.time()
+    DataAnalysis.analyzeMetaData(commutes)
+    timings.append(('metadata', len(commutes), time.time() - start))
+    return timings
+
+#The commit the suite is run at, if this is a git checkout
+def currentCommit():
+    try:
+        return subprocess.run(['git','rev-parse','--short','HEAD'], cwd = filePath, capture_output = True, text = True).stdout.strip()
+    except OSError:
+        return ''
+
+#Appends the timings of a run to the results file, flagging those slower than the best recorded by regressionTolerance.
+def recordResults(results, resultsPath = benchmarkResultsPath):
+    if os.path.exists(resultsPath):
+        best = pd.read_csv(resultsPath).groupby(['benchmark','rows'])['seconds'].min()
+        results['best_seconds'] = [best.get((benchmark, rows), np.nan) for benchmark, rows in zip(results['benchmark'], results['rows'])]
+    else:
+        results['best_seconds'] = np.nan
+    results['regression'] = results['seconds'] > results['best_seconds']*regressionTolerance
+
+    print('\n{0:<12}{1:>10}{2:>12}{3:>10}{4:>14}{5:>10}'.format('Stage','Trips','Stage rows','Seconds','Rows/s','Best'))
+    for result in results.itertuples():
+        print('{0:<12}{1:>10}{2:>12}{3:>10.3f}{4:>14.0f}{5:>10}{6}'.format(result.benchmark, result.rows, result.stage_rows, result.seconds,
+              result.rows_per_second, '' if np.isnan(result.best_seconds) else '{0:0.3f}'.format(result.best_seconds),
+              '  REGRESSION' if result.regression else ''))
+
+    results.drop(['best_seconds','regression'], axis = 1).to_csv(resultsPath, mode = 'a', header = not os.path.exists(resultsPath), index = False)
+    print('Appended ' + str(len(results)) + ' timings to ' + resultsPath)
+    if results['regression'].any():
+        print(str(results['regression'].sum()) + ' stages are more than {0:0.0%} slower than their best.'.format(regressionTolerance - 1))
+    return results
+
+#Runs benchmarkStages at each number of trips and records the timings.
+def benchmarkSuite(sizes = suiteSizes, resultsPath = benchmarkResultsPath):
+    sampler = SyntheticTrips.loadZoneSampler()
+    zones = ZoneGeocoder.loadZones(taxiShapefilePath, taxiZoneLookupPath)
+    routes = RouteTable.loadRoutes()
+
+    results = []
+    for rows in sizes:
+        print('Benchmarking ' + str(rows) + ' trips...')
+        for benchmark, stageRows, seconds in benchmarkStages(rows, sampler, zones, routes):
+            results.append({'benchmark':benchmark, 'rows':rows, 'stage_rows':stageRows, 'seconds':seconds,
+                            'rows_per_second':stageRows/seconds if seconds > 0 else np.nan})
+    results = pd.DataFrame(results)
+    results.insert(0, 'date', time.strftime('%Y-%m-%dT%H:%M:%S'))
+    results.insert(1, 'commit', currentCommit())
+    return recordResults(results, resultsPath)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        raise Exception("ERROR: must submit the name of a benchmark to run.")
+
+    if sys.argv[1] == 'zones':
+        tripFile = filePath + '/' + sys.argv[2] if len(sys.argv) > 2 else None
+        rowwiseRows = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+        benchmarkZoneJoin(tripFile, rowwiseRows)
+    elif sys.argv[1] == 'transform':
+        benchmarkTransform(int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+    elif sys.argv[1] == 'commutes':
+        benchmarkCommutes(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
+    elif sys.argv[1] == 'cube':
+        benchmarkCube(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
+    elif sys.argv[1] == 'windows':
+        benchmarkWindows(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000, int(sys.argv[3]) if len(sys.argv) > 3 else 7)
+    elif sys.argv[1] == 'clusters':
+        benchmarkClusters(int(sys.argv[2]) if len(sys.argv) > 2 else 10000000, int(sys.argv[3]) if len(sys.argv) > 3 else DataAnalysis.clusterRadius)
+    elif sys.argv[1] == 'routes':
+        benchmarkRoutes(int(sys.argv[2]) if len(sys.argv) > 2 else 5000000)
+    elif sys.argv[1] == 'schema':
+        benchmarkSchema(int(sys.argv[2]) if len(sys.argv) > 2 else 10000000)
+    elif sys.argv[1] == 'datetimes':
+        benchmarkDatetimes(int(sys.argv[2]) if len(sys.argv) > 2 else 5000000)
+    elif sys.argv[1] == 'fares':
+        benchmarkFares(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000, int(sys.argv[3]) if len(sys.argv) > 3 else 100000)
+    elif sys.argv[1] == 'compressed':
+        if len(sys.argv) < 3:
+            raise Exception("ERROR: must submit the path of a compressed .csv file.")
+        benchmarkCompressed(filePath + '/' + sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 1000000)
+    elif sys.argv[1] == 'startup':
+        benchmarkZoneStartup(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
+    elif sys.argv[1] == 'views':
+        benchmarkViews(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
+    elif sys.argv[1] == 'outofcore':
+        benchmarkOutOfCore(int(sys.argv[2]) if len(sys.argv) > 2 else 6, int(sys.argv[3]) if len(sys.argv) > 3 else 1000000)
+    elif sys.argv[1] == 'suite':
+        benchmarkSuite([int(float(rows)) for rows in sys.argv[2:]] or suiteSizes)
+    else:
+        raise Exception("ERROR: unknown benchmark " + sys.argv[1])
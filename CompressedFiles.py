@@ -0,0 +1,134 @@
+#Reads raw taxi .csv files straight out of their gzip, bzip2 or zip archives, without decompressing them to disk first.
+#Dependencies: standard library only, optionally pigz, lbzip2 or pbzip2 on the PATH
+#Files are decompressed as a stream by a background thread, or by one of the parallel command line decompressors when
+#installed (lbzip2 and pbzip2 decompress the independent blocks of a bzip2 file on every core, pigz offloads reading
+#and checksumming from the inflating thread), so decompression overlaps with pandas parsing the previous block.
+#Compressed files cannot be split into byte ranges, each is read whole by a single worker.
+
+import bz2
+import gzip
+import io
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import zipfile
+
+#Extensions of compressed files and the module reading each
+compressions = {'.gz':gzip, '.bz2':bz2, '.zip':zipfile}
+
+#Parallel decompressors for each extension, in order of preference, each writing the decompressed file to stdout
+decompressors = {'.gz':[['pigz','-dc']], '.bz2':[['lbzip2','-dc'], ['pbzip2','-dc']]}
+
+#Bytes decompressed at a time, and blocks decompressed ahead of the parser
+blockBytes = 8*1024*1024
+prefetchBlocks = 4
+
+#Patterns of the raw files of a folder, plain or compressed. Zip archives are matched by *.zip alone, whatever they are
+#named, as '*.csv.zip' would list them a second time.
+rawFilePatterns = ['*.csv'] + ['*.csv' + extension for extension in compressions if extension != '.zip'] + ['*.zip']
+
+def compression(path):
+    extension = os.path.splitext(path)[1].lower()
+    return extension if extension in compressions else None
+
+#Name of a raw file without its .csv and compression extensions, e.g. yellow_tripdata_2015-01
+def baseName(path):
+    name = os.path.basename(path)
+    if compression(name):
+        name = os.path.splitext(name)[0]
+    return os.path.splitext(name)[0] if name.lower().endswith('.csv') else name
+
+#The single .csv file of a zip archive
+def zipMember(archive):
+    members = [name for name in archive.namelist() if name.lower().endswith('.csv')]
+    if len(members) != 1:
+        raise Exception("ERROR: " + archive.filename + " must hold exactly one .csv file, it holds " + str(len(members)) + ".")
+    return members[0]
+
+#Opens the decompressed contents of a file with the standard library, which is enough to read its header.
+def openFile(path):
+    extension = compression(path)
+    if extension is None:
+        return open(path, 'rb')
+    if extension == '.zip':
+        archive = zipfile.ZipFile(path)
+        return archive.open(zipMember(archive))
+    return compressions[extension].open(path, 'rb')
+
+def readHeader(path):
+    with openFile(path) as f:
+        return f.readline().decode('utf-8', errors = 'replace')
+
+#Opens a file for pd.read_csv, decompressing it in the background if it is compressed.
+def openStream(path):
+    extension = compression(path)
+    if extension is None:
+        return open(path, 'rb')
+    for command in decompressors.get(extension, []):
+        if shutil.which(command[0]):
+            process = subprocess.Popen(command + [path], stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+            return io.BufferedReader(PrefetchReader(process.stdout, path, process), blockBytes)
+    return io.BufferedReader(PrefetchReader(openFile(path), path), blockBytes)
+
+#Raw binary stream over a source read blockBytes at a time by a background thread, up to prefetchBlocks ahead.
+#zlib and bz2 release the GIL while decompressing, as does reading a decompressor's pipe, so the next blocks are
+#decompressed while pandas parses the current one. If the source is a decompressor's stdout, its exit status is checked.
+class PrefetchReader(io.RawIOBase):
+    def __init__(self, source, path, process = None):
+        self.source = source
+        self.path = path
+        self.process = process
+        self.blocks = queue.Queue(prefetchBlocks)
+        self.block = memoryview(b'')
+        self.done = False
+        self.stopping = False
+        self.thread = threading.Thread(target = self.prefetch, daemon = True)
+        self.thread.start()
+
+    def prefetch(self):
+        try:
+            while not self.stopping:
+                block = self.source.read(blockBytes)
+                self.blocks.put(block)
+                if not block:
+                    break
+        except Exception as error:
+            self.blocks.put(error)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.block and not self.done:
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self.done = True
+                self.checkProcess()
+            self.block = memoryview(block)
+        count = min(len(buffer), len(self.block))
+        buffer[:count] = self.block[:count]
+        self.block = self.block[count:]
+        return count
+
+    def checkProcess(self):
+        if self.process is not None and self.process.wait() != 0:
+            raise Exception("ERROR: decompressing " + self.path + " failed: " + self.process.stderr.read().decode(errors = 'replace').strip())
+
+    def close(self):
+        if not self.closed:
+            #Stops the decompressor, then unblocks the thread if it is waiting on a full queue
+            self.stopping = True
+            if self.process is not None and self.process.poll() is None:
+                self.process.kill()
+                self.process.wait()
+            while self.thread.is_alive():
+                try:
+                    self.blocks.get(timeout = 0.1)
+                except queue.Empty:
+                    pass
+            self.source.close()
+        super().close()
@@ -1,26 +1,29 @@
 #Calculates commuter efficiency and potential
+#With --out-of-core, each processed file is aggregated into partial cubes on its own, which are kept and merged into
+#the cubes of the whole dataset, so only a month of trips is ever in memory and unchanged months are not read again.
 import pandas as pd
 import numpy as np
-import glob as glob
-import math
-import time
+import argparse
+import glob
 import os
+import RouteTable
+import StageProfiler
+import TripSchema
 
-start = time.time()
 filePath = os.path.dirname(os.path.realpath(__file__))
-cleanedTripPath = filePath + '/../reverseGeocachedData/*'
+cleanedTripPath = filePath + '/../reverseGeocachedData'
+
+#The only columns of the processed trips the analysis needs, nothing else is read from disk
+analysisColumns = ['pickup_datetime','passenger_count','trip_distance','fare_amount','pickup_latitude','dropoff_latitude',
+                   'pickup_borough','pickup_neighborhood','dropoff_borough','dropoff_neighborhood']
 
 #The following variables represent static estimates or averages.
 #With the addition of more data and modeling of each parameter, even greater accuracy can be reached.
 
-#Regions of interest as defined by nyc.gov's taxi zoning
-Astoria = ['Astoria','Astoria Park']
-Midtown = ['Midtown Center','Midtown North','Midtown South','Midtown East']
-UpperEastSide = ['Upper East Side North','Upper East Side South']
-
-#Lower cut-off latitude for destinations requiring the Queensboro bridge or Kennedy F. Kennedy Bridge from LGA,
-#Which necessitates traveling through/near Astoria, as approximated by Google Maps routing.
-UpperManhattanLat = 40.76
+#Regions and routes of interest, as defined by nyc.gov's taxi zoning, are in routes.json.
+#The LGA to/from Upper Manhattan routes have a lower cut-off latitude for destinations requiring the Queensboro bridge
+#or Robert F. Kennedy Bridge from LGA, which necessitates traveling through/near Astoria, as approximated by Google Maps routing.
+routesPath = filePath + '/routes.json'
 
 #Our goal for number of passengers per carpool
 carpoolGoal = 3
@@ -28,64 +31,273 @@ carpoolGoal = 3
 #Our estimate for the mean time in minutes it takes for a via-cle to gather up a carpoolGoal worth of people 
 intervalWeekMinutes = 15
 
+#The neighborhood the LGA to/from Upper Manhattan trips pass through, and are analyzed as if picked up in
+astoriaNeighborhood = 'Astoria'
+
 #Our estimate for mean time in minutes it takes to drive from LGA to Astoria
 LGAtoAstoria = 20
 
 #Our estimate for mean time in minutes it takes to drive from Upper Manhattan to LGA
 UpperManhattanToAstoria = 30
 
+#Our estimate for the distance in meters a rider would walk to or from a carpool, when clustering trips by coordinates
+clusterRadius = 250
+
+#Meters per degree of latitude, and per degree of longitude at NYC's latitude
+metersPerDegreeLat = 111320
+metersPerDegreeLon = 111320*np.cos(np.radians(40.75))
+
 #grams of CO2 per driven mile, as per the EPA
 #https://www.epa.gov/sites/production/files/2016-02/documents/420f14040a.pdf
 CO2perMile = 411
 
-def readFiles():
-   
-    all_trip_files = glob.glob(cleanedTripPath)
-    df_list = []
-    for a_file in all_trip_files:
-    
-        df = pd.read_pickle(a_file)
-        df_list.append(df)
+#Reads the processed trips dataset, loading only the given columns.
+#Filters are pushed down to the parquet reader, e.g. [('year','=',2016),('month','=',1),('color','=','yellow')]
+#only opens the January 2016 yellow cab partition, and zone filters skip row groups that cannot match.
+#Columns are given their compact TripSchema types, fares being in cents, including those of trips extracted before them.
+#Datetimes are stored parsed, only those of trips extracted as strings are parsed here.
+#Given a path, only that folder or single processed file is read.
+def readFiles(columns = analysisColumns, filters = None, path = None):
     
-    df = pd.concat(df_list)
-    df['pickup_datetime'] = pd.to_datetime(df['pickup_datetime'])
-    df['dropoff_datetime'] = pd.to_datetime(df['dropoff_datetime'])
-    return df
+    df = pd.read_parquet(cleanedTripPath if path is None else path, columns = columns, filters = filters)
+    return TripSchema.compactTrips(df)
+
+#The processed files of the trips dataset, each holding part of a month of one color of cab
+def processedFiles(path = None):
+    return sorted(glob.glob(os.path.join(cleanedTripPath if path is None else path, '**', '*.parquet'), recursive = True))
+
+#Separates out the trips of each set of routes we analyze, keyed by their abbreviation in routes.json.
+#Every trip is classified in one lookup of the route table, rather than a string comparison per route.
+#Each route set is a view of df holding the positions of its trips rather than a copy of them, see routeView.
+#The LGA to/from Upper Manhattan trips (LU and UL) are analyzed as part of AAll, see findCommuteAirport.
+def findRouteSets(df, routesPath = routesPath):
+    routes = RouteTable.loadRoutes(routesPath)
+    bits = RouteTable.classifyNamedTrips(df, routes)
+    return {name:routeView(np.flatnonzero(RouteTable.onRoute(bits, routes, name))) for name in routes['names']}
+
+#A view of the trips of a route set within the one frame of every trip: the positions of its trips, and for the trips
+#analyzed as if picked up in Astoria, the minutes their pickup is shifted by, as columns computed over the view
+#instead of shifted copies of the trips. Trips not shifted have no shift_minutes and via_astoria.
+def routeView(rows, shift = None):
+    rows = np.asarray(rows, dtype = np.intp)
+    return {'rows':rows,
+            'shift_minutes':None if shift is None else np.full(len(rows), shift, dtype = np.int64),
+            'via_astoria':None if shift is None else np.ones(len(rows), dtype = bool)}
+
+#A single view of the trips of several views of the same frame
+def concatViews(views):
+    rows = np.concatenate([view['rows'] for view in views])
+    if all(view['shift_minutes'] is None for view in views):
+        return routeView(rows)
+    return {'rows':rows,
+            'shift_minutes':np.concatenate([np.zeros(len(view['rows']), dtype = np.int64) if view['shift_minutes'] is None
+                                            else view['shift_minutes'] for view in views]),
+            'via_astoria':np.concatenate([np.zeros(len(view['rows']), dtype = bool) if view['via_astoria'] is None
+                                          else view['via_astoria'] for view in views])}
+
+#Copies the trips of a view out of df, shifted as the view says, for the functions working on frames of trips.
+def viewTrips(df, view):
+    df = df.iloc[view['rows']]
+    if view['via_astoria'] is None:
+        return df
+    pickups = df['pickup_neighborhood'].astype(object).where(~view['via_astoria'], astoriaNeighborhood)
+    return df.assign(pickup_datetime = df['pickup_datetime'] + pd.to_timedelta(view['shift_minutes'], unit = 'm'),
+                     pickup_neighborhood = pickups)
+
+#The route sets we analyze, keyed by their abbreviation, as views of df
+def routeSetViews(df, routesPath = routesPath):
+    routeSets = findRouteSets(df, routesPath)
+    return {'AA':routeSets['AA'],
+            'AM':routeSets['AM'],
+            'MA':routeSets['MA'],
+            #From Astoria to Manhattan and Manhattan to Astoria, but with LGA traffic
+            'AAll':findCommuteAirport(routeSets),
+            'UMid':routeSets['UMid'],
+            'MidU':routeSets['MidU'],
+            'UU':routeSets['UU']}
+
+#Aggregates the trips of each route set with findCommutes and analyzeMetaData, rather than into a cube, and saves the
+#occupied intervals of each to folder as <route set>_commutes.csv. Returns the metadata of each route set.
+#With a window, the trips are matched into carpools by matchWindows instead, saved as <route set>_windows.csv.
+#With a radius, routes are between clusters of coordinates, see clusterTrips, saved as <route set>_clusters.csv,
+#or <route set>_windows_clusters.csv along with a window.
+def analyzeCommutes(df, views, folder, window = None, radius = None):
+    os.makedirs(folder, exist_ok = True)
+    name = '_'.join((['windows'] if window is not None else []) + (['clusters'] if radius is not None else [])) or 'commutes'
+    metadata = {}
+    for key in views:
+        print('\n' + 'Finding ' + name + ': ' + key + '...')
+        with StageProfiler.stage(name, key, len(views[key]['rows'])) as stage:
+            commutes = findCommutes(viewTrips(df, views[key]), window, radius)
+            stage['rows_out'] = len(commutes)
+        with StageProfiler.stage('save', key):
+            #The summed week_minutes column means nothing, the interval is in the index
+            commutes.drop('week_minutes', axis = 1, errors = 'ignore').to_csv(os.path.join(folder, key + '_' + name + '.csv'))
+        metadata[key] = analyzeMetaData(commutes)
+    return metadata
+
+#Columns identifying a route, i.e. a pair of pickup and dropoff neighborhoods
+routeColumns = ['pickup_neighborhood','dropoff_neighborhood']
+
+#Columns identifying a route between clusters of pickup and dropoff coordinates, see clusterTrips
+clusterColumns = ['pickup_cluster','dropoff_cluster']
 
 #Separate out the different destination or arrival neighborhoods,
 #and perform analysis on each.
-def findCommutes(df):
-    dfList = []
-    #We groupby both the pickup and destination neighborhoods, effectively looping through all routes
-    gp = df.groupby([df.pickup_neighborhood,df.dropoff_neighborhood])
-    
-    for key, item in gp:
-        print('\n' + 'Finding trips between: ' + str(key) + '...' + key[0] + ' ' + key[1])
-   
-        transformed_df = transformData(gp.get_group(key))
-        transformed_df['pickup_neighborhood'] = key[0]
-        transformed_df['dropoff_neighborhood'] = key[1]
-        #transformed_df['pickup_borough'] = transformed_df.iloc[0].pickup_borough
-        #transformed_df['dropoff_borough'] = transformed_df.iloc[0].dropoff_borough
-   
-        dfList.append(transformed_df)
-
-    return pd.concat(dfList)
+#With a window, trips are matched into carpools departing within window minutes of their pickups instead, see matchWindows.
+#With a radius, routes are between clusters of coordinates rather than neighborhoods, see clusterTrips.
+def findCommutes(df, window = None, radius = None):
+    by = routeColumns
+    if radius is not None:
+        df = clusterTrips(df, radius)
+        by = clusterColumns
+    #Rather than looping through all routes, every route is aggregated at once by grouping on its neighborhoods as well
+    df = transformData(df, by, window)
+    print('Found trips between ' + str(len(df.index.droplevel([name for name in df.index.names if name not in by]).unique())) + ' pairs of ' +
+          ('clusters' if radius is not None else 'neighborhoods'))
+    #The neighborhoods are columns, with the week and interval as index, as when each route was transformed on its own
+    df = df.reset_index(by)
+    return df[[column for column in df.columns if column not in by] + by]
+
+#Neighborhoods are coarse, so riders a block apart on either side of a zone's edge are never carpooled together.
+#Instead, trips can be grouped by the clusters their pickup and dropoff coordinates fall in, given by clusterPoints.
+#Only trips before July 2016 have coordinates, trips without them are left out.
+def clusterTrips(df, radius = None):
+    radius = clusterRadius if radius is None else radius
+    coordinates = df[['pickup_longitude','pickup_latitude','dropoff_longitude','dropoff_latitude']]
+    located = (coordinates.notna() & (coordinates != 0)).all(axis = 1).values
+    if not located.all():
+        print('Leaving out ' + str((~located).sum()) + ' trips without coordinates')
+    df = df[located]
+
+    #Pickups and dropoffs are clustered together, so a place is in the same cluster at either end of a trip
+    labels, cluster = clusterPoints(np.concatenate([df['pickup_longitude'].values, df['dropoff_longitude'].values]),
+                                    np.concatenate([df['pickup_latitude'].values, df['dropoff_latitude'].values]), radius)
+    return df.assign(pickup_cluster = pd.Categorical.from_codes(cluster[:len(df)], labels),
+                     dropoff_cluster = pd.Categorical.from_codes(cluster[len(df):], labels))
+
+#Clusters points by hashing them into a grid of square cells radius meters wide, then joining each cell to the busiest cell
+#of the 3x3 cells around it. Points split by a cell's edge therefore join the same cluster, and every point is within
+#1.5 radius of its cluster's center along either axis. Only occupied cells are searched, so this takes O(n log n) time
+#rather than comparing every pair of points.
+#Returns the labels of the clusters, as 'latitude,longitude' of their centers, and the cluster of each point.
+def clusterPoints(lon, lat, radius):
+    #Cells are numbered row by row, with a margin of one cell so that neighbors never wrap around a row
+    x = np.floor(lon*metersPerDegreeLon/radius).astype(np.int64)
+    y = np.floor(lat*metersPerDegreeLat/radius).astype(np.int64)
+    xOrigin, yOrigin = (x.min() - 1, y.min() - 1) if len(x) else (0, 0)
+    width = x.max() - xOrigin + 2 if len(x) else 1
+    cells, point = np.unique((y - yOrigin)*width + (x - xOrigin), return_inverse = True)
+    counts = np.bincount(point, minlength = len(cells))
+
+    #The busiest neighbor of each cell, ties going to the first cell
+    busiest = np.arange(len(cells))
+    for dy in [-1, 0, 1]:
+        for dx in [-1, 0, 1]:
+            neighbor = np.minimum(np.searchsorted(cells, cells + dy*width + dx), len(cells) - 1)
+            found = cells[neighbor] == cells + dy*width + dx
+            busier = found & ((counts[neighbor] > counts[busiest]) | ((counts[neighbor] == counts[busiest]) & (neighbor < busiest)))
+            busiest = np.where(busier, neighbor, busiest)
+
+    centers, cluster = np.unique(busiest, return_inverse = True)
+    centerLon = (cells[centers] % width + xOrigin + 0.5)*radius/metersPerDegreeLon
+    centerLat = (cells[centers]//width + yOrigin + 0.5)*radius/metersPerDegreeLat
+    labels = ['{0:.5f},{1:.5f}'.format(a, b) for a, b in zip(centerLat, centerLon)]
+    return labels, cluster[point]
 
 #Given a dataframe of of taxi trips between two specific boroughs, clusters the ride grouped on weekday and given minute interval.
-def transformData(df):
+#Trips of several routes can be clustered in one go by also grouping on the columns in by, which lead the resulting index.
+#Given a window in minutes, trips are matched by matchWindows rather than cut into fixed intervals.
+def transformData(df, by = [], window = None):
+    by = list(by)
     #Latitude and longitue are irrelevant now that we aggregating data
-    df = df.drop(['pickup_longitude','pickup_latitude','dropoff_longitude','dropoff_latitude'], axis = 1)
+    df = df.drop(['pickup_longitude','pickup_latitude','dropoff_longitude','dropoff_latitude'], axis = 1, errors = 'ignore')
+    #Only numeric columns can be summed, so other columns such as the dropoff time are left out,
+    #apart from the route's columns in by and the pickup time, which the trips are grouped on
+    df = df[by + ['pickup_datetime'] + [column for column in df.select_dtypes(include = 'number').columns if column not in by]]
+    if window is not None:
+        return matchWindows(df, by, window)
     #Calculate minutes since 12:00am Monday
-    df = df.apply(calcWeekMinutes,axis = 1)
+    df['week_minutes'] = calcWeekMinutes(df['pickup_datetime'])
     #The following is a bit tricky, first we groupby week, then we groupby some interval of minutes throughout the week.
-    gp = df.groupby([pd.TimeGrouper('W',key = 'pickup_datetime'),pd.cut(df.week_minutes,np.arange(0,7*24*60+intervalWeekMinutes,intervalWeekMinutes))])
+    gp = df.groupby(by + [pd.Grouper(freq = 'W', key = 'pickup_datetime'),cutWeekMinutes(df['week_minutes'])], observed = True)
     df = gp.sum()
     df['taxi_count'] = gp.size() #Retrieve the number of rows in our grouped object for the taxi count
     df = df.fillna(0)
-    df = df.apply(calcCarpools,axis = 1)
+    df['carpool_count'] = calcCarpools(df['taxi_count'].values, df['passenger_count'].values)
     return(df)
 
+#The largest sort key matchWindows orders trips on at once, past which it sorts on route and pickup time separately
+maxSortKey = np.iinfo(np.int64).max
+
+#Fixed intervals split riders a couple of minutes apart across an interval's edge. Instead, each route's trips are sorted
+#by pickup time and matched into carpools departing at any time, each picking up every rider within window minutes
+#either side of its departure. The earliest unmatched trip departs window minutes after its pickup, which is the fewest
+#departures covering every trip, and the carpools of each departure are counted by calcCarpools as for an interval.
+#The result is indexed by the columns in by and the departure time, and takes O(n log n) time on the whole frame.
+def matchWindows(df, by, window):
+    #Routes are numbered from the sorted codes of their columns in by, trips missing one or their pickup time belong to none.
+    #They are renumbered after each column, so route numbers stay below the number of trips rather than the product of the codes.
+    factors = [pd.factorize(df[column], sort = True) for column in by]
+    valid = ~np.isnat(df['pickup_datetime'].values)
+    for codes, uniques in factors:
+        valid &= codes >= 0
+    route = np.zeros(np.count_nonzero(valid), dtype = np.int64)
+    for codes, uniques in factors:
+        route = pd.factorize(route*len(uniques) + codes[valid], sort = True)[0].astype(np.int64)
+    seconds = df['pickup_datetime'].values[valid].astype('datetime64[s]').astype(np.int64)
+
+    #Trips are sorted by route then pickup, on a single key spacing routes further apart than any window
+    span = 2*window*60
+    first = seconds.min() if len(seconds) else 0
+    routeLength = seconds.max() - first + span + 1 if len(seconds) else 1
+    if len(route) == 0 or route.max() <= (maxSortKey - routeLength)//routeLength:
+        sortKey = route*routeLength + (seconds - first)
+        order = np.argsort(sortKey, kind = 'stable')
+        sortKey = sortKey[order]
+    else:
+        #Too many routes over too long a time for that key, so trips are sorted on route and pickup separately,
+        #and each route's key starts just past the window of the previous route's last trip instead
+        order = np.lexsort((seconds, route))
+        sortKey = seconds[order]
+        routeStarts = np.flatnonzero(np.diff(route[order], prepend = -1))
+        routeEnds = np.append(routeStarts[1:], len(order)) - 1
+        routeLengths = sortKey[routeEnds] - sortKey[routeStarts] + span + 1
+        sortKey = sortKey - np.repeat(sortKey[routeStarts] - (np.cumsum(routeLengths) - routeLengths), routeEnds - routeStarts + 1)
+    #The first trip past the window of a departure at each trip, which is the next route's first trip at the end of a route
+    nextTrip = np.append(np.searchsorted(sortKey, sortKey + span, side = 'right'), len(sortKey))
+
+    #The departures are the chain of next trips from the first, marked by doubling the jumps along it,
+    #so that each pass over the trips marks as many departures as all of the passes before it.
+    departs = np.zeros(len(sortKey) + 1, dtype = bool)
+    departs[0] = True
+    while nextTrip[0] < len(sortKey):
+        departs[nextTrip[np.flatnonzero(departs)]] = True
+        nextTrip = nextTrip[nextTrip]
+    starts = np.flatnonzero(departs[:len(sortKey)])
+
+    #The trips of each carpool are contiguous once sorted, so their sums are taken over runs of the sorted columns,
+    #in 64 bits so that compact columns don't overflow
+    pickups = df['pickup_datetime'].values[valid]
+    df = df[valid].drop(['pickup_datetime'] + by, axis = 1)
+    firstTrips = order[starts]
+    df = pd.DataFrame({column:np.add.reduceat(np.nan_to_num(df[column].values[order]), starts,
+                                              dtype = np.float64 if df[column].dtype.kind == 'f' else np.int64) if len(starts) else df[column].values[:0]
+                       for column in df.columns})
+    df['taxi_count'] = np.diff(np.append(starts, len(sortKey)))
+
+    #Each carpool is labelled by its route and departure time
+    departures = pd.DatetimeIndex(pickups[firstTrips] + np.timedelta64(window, 'm'), name = 'pickup_datetime')
+    if by:
+        departureCodes, departureLevel = pd.factorize(departures, sort = True)
+        df.index = pd.MultiIndex([uniques for codes, uniques in factors] + [departureLevel],
+                                 [codes[valid][firstTrips] for codes, uniques in factors] + [departureCodes],
+                                 names = by + ['pickup_datetime'])
+    else:
+        df.index = departures
+    df['carpool_count'] = calcCarpools(df['taxi_count'].values, df['passenger_count'].values)
+    return df
+
 #Let's crunch some metadata
 def analyzeMetaData(df):
     
@@ -95,7 +307,7 @@ def analyzeMetaData(df):
     df.miles_reduction = df.car_reduction_ratio*df.trip_distance.sum()
     df.CO2_reduction = (df.miles_reduction * CO2perMile)/907185 #907185 grams per ton
     df.taxi_mean_passenger = df.passenger_count.sum()/df.total_taxis
-    df.total_fare = df.fare_amount.sum()
+    df.total_fare = TripSchema.toDollars(df.fare_amount.sum()) #Fares are in cents
     
     print('Total Taxi Count: ' + str(df.total_taxis) + '\n' + 
           'Total Carpool Count: ' + str(df.total_carpools) + '\n' +
@@ -106,105 +318,108 @@ def analyzeMetaData(df):
           'Mean Passengers Per Taxi: ' + str('%.2f' % df.taxi_mean_passenger))
     return df
 
-#Given a time, we want to return the minutes since 12:00am Monday, or week_minutes as I call it.
-def calcWeekMinutes(series):
-    
-    date = series.pickup_datetime
-    series['week_minutes'] = date.dayofweek*24*60 + date.hour*60 + date.minute
-    return series
+#Given times, we want to return the minutes since 12:00am Monday, or week_minutes as I call it.
+#Computed on whole columns from the minutes since the epoch, which began on a Thursday.
+def calcWeekMinutes(dates):
+    minutes = dates.values.astype('datetime64[m]').astype(np.int64)
+    return (minutes + 3*24*60) % (7*24*60)
 
-def calcCarpools(series):
-    
-    if (series.taxi_count == 0):
-        series['carpool_count'] = 0   
+#Intervals of intervalWeekMinutes throughout the week, the same as pd.cut(week_minutes, bins) gives,
+#but from integer division rather than searching and labelling the bins for every route.
+def cutWeekMinutes(weekMinutes):
+    intervals = pd.IntervalIndex.from_breaks(np.arange(0,7*24*60+intervalWeekMinutes,intervalWeekMinutes))
+    #Intervals are closed on the right, so minute 0 belongs to none of them, as with pd.cut
+    codes = (weekMinutes.values - 1)//intervalWeekMinutes
+    return pd.Series(pd.Categorical.from_codes(codes, intervals), index = weekMinutes.index, name = weekMinutes.name)
+
+#Given the taxi and passenger counts of each interval, returns the number of carpools needed to reach goal passengers each.
+def calcCarpools(taxiCount, passengerCount, goal = None):
+    goal = carpoolGoal if goal is None else goal
+    #Even if there are less people than our goal, we are still obligated to pick them up.
+    carpoolCount = np.maximum(passengerCount//goal, 1)
     #If there is exactly one taxi, we cannot carpool better than that.
-    elif (series.taxi_count == 1):
-        series['carpool_count'] = 1 
-    else:
-        carpoolCount = math.floor(series.passenger_count/carpoolGoal)
-        #Even if there are less people than our goal, we are still obligated to pick them up.
-        if carpoolCount == 0:
-            series['carpool_count'] = 1
-        else:
-            series['carpool_count'] = carpoolCount
-        
-    return series
+    carpoolCount = np.where(taxiCount == 1, 1, carpoolCount)
+    return np.where(taxiCount == 0, 0, carpoolCount)
 
 #To calculate the extra carpooling opportunities afforded by traffic betwixt LGA and Upper Manhattan,
 #we merge commuters starting from LGA and Astoria heading to Manhattan,
 #but time-shift the fliers by the time it takes them to get near Astoria.
-def findCommuteAirport(dfLU,dfUL,dfAM,dfMA,dfLA,dfAL):
+#Given the route sets of findRouteSets, returns a view of all of their trips, the shift only being computed over the view.
+def findCommuteAirport(routeSets, lga = None, upper = None):
+    lga = LGAtoAstoria if lga is None else lga
+    upper = UpperManhattanToAstoria if upper is None else upper
 
     #The following trips do not have a pickup or dropoff in Astoria, but do pass through it.
-    dfLU.pickup_datetime = dfLU.pickup_datetime + pd.DateOffset(minutes=LGAtoAstoria)
-    dfLU.pickup_neighborhood = 'Astoria'
-   
-    dfUL.pickup_datetime = dfUL.pickup_datetime + pd.DateOffset(minutes=UpperManhattanToAstoria)
-    dfUL.pickup_neighborhood = 'Astoria'
-    
-    return pd.concat([dfLU,dfUL,dfAM,dfMA,dfLA,dfAL])
+    viewLU = shiftToAstoria(routeSets['LU'], lga)
+    viewUL = shiftToAstoria(routeSets['UL'], upper)
+
+    return concatViews([viewLU, viewUL, routeSets['AM'], routeSets['MA'], routeSets['LA'], routeSets['AL']])
+
+#The trips of a view passing near Astoria, as if picked up there the given number of minutes after their actual pickup.
+def shiftToAstoria(view, minutes):
+    return routeView(view['rows'], minutes)
 
 
 if __name__ == '__main__':
-    df = readFiles()
-    
-    #We analyze the data pertaining to the neighborhoods in question.
-    
-    dfAA = df[((df['dropoff_neighborhood'].isin(Astoria)) #Within Astoria 
-            & (df['pickup_neighborhood'].isin(Astoria)))] 
-    
-    dfAM = df[((df['pickup_neighborhood'].isin(Astoria)) #From Astoria to Manhattan
-            & (df['dropoff_borough'].isin(['Manhattan'])))] 
-    
-    dfMA = df[((df['dropoff_neighborhood'].isin(Astoria)) #From Manhattan to Astoria 
-            & (df['pickup_borough'].isin(['Manhattan'])))]       
-    
-    dfLU = df[((df['pickup_neighborhood'].isin(['LaGuardia Airport'])) #From LGA to Upper Manhattan 
-            & (df['dropoff_latitude'] >= UpperManhattanLat)
-            & (df['dropoff_borough'].isin(['Manhattan'])))]
-    
-    dfUL = df[((df['dropoff_neighborhood'].isin(['LaGuardia Airport'])) #From Upper Manhattan to LGA
-            & (df['pickup_latitude'] >= UpperManhattanLat)
-            & (df['pickup_borough'].isin(['Manhattan'])))]
-          
-    dfLA = df[((df['pickup_neighborhood'].isin(['LaGuardia Airport'])) #From LGA to Astoria 
-            & (df['dropoff_neighborhood'].isin(Astoria)))] 
-
-    dfAL = df[((df['dropoff_neighborhood'].isin(['LaGuardia Airport'])) #From Astoria to LGA
-            & (df['pickup_neighborhood'].isin(Astoria)))]
-    
-    dfAAll = findCommuteAirport(dfLU,dfUL,dfAM,dfMA,dfLA,dfAL) #From Astoria to Manhattan and Manhattan to Astoria, but with LGA traffic
-
-    dfUMid = df[((df['pickup_neighborhood'].isin(UpperEastSide)) #From Upper East Side to Midtown
-            & (df['dropoff_neighborhood'].isin(Midtown)))] 
-         
-    dfMidU = df[((df['dropoff_neighborhood'].isin(UpperEastSide)) #From Midtown to Upper East Side 
-            & (df['pickup_neighborhood'].isin(Midtown)))] 
-         
-    dfUU = df[((df['dropoff_neighborhood'].isin(UpperEastSide)) #Within Upper East Side 
-            & (df['pickup_neighborhood'].isin(UpperEastSide)))]
-    
-    del df
-
-    dfDict = {'AA':dfAA,
-              'AM':dfAM,
-              'MA':dfMA,
-              'AAll':dfAAll,
-              'UMid':dfUMid,
-              'MidU':dfMidU,
-              'UU':dfUU}
-    
-    del dfAA, dfAM, dfMA, dfLU, dfUL, dfLA, dfAL, dfAAll, dfUMid, dfMidU, dfUU
-    
-    print('It took {0:0.1f} seconds to read in the data frames'.format(time.time() - start))
-    
-    for dfkey in dfDict:
+    import TripCube
+    parser = argparse.ArgumentParser(description = 'Calculates commuter efficiency and potential.')
+    parser.add_argument('--report', default = filePath + '/analyzedData/report.json',
+                        help = 'path of the .json run report, also written as .csv (default: %(default)s)')
+    parser.add_argument('--profile', action = 'store_true',
+                        help = 'profile each stage with cProfile and write the slowest one next to the report as .prof')
+    parser.add_argument('--commutes', action = 'store_true',
+                        help = 'also aggregate each route set with findCommutes, saving its intervals as analyzedData/<route set>_commutes.csv')
+    parser.add_argument('--window', type = int, default = None, metavar = 'N',
+                        help = 'also match each route set into carpools departing within N minutes of their pickups, see matchWindows, saving them as analyzedData/<route set>_windows.csv')
+    parser.add_argument('--radius', type = int, default = None, metavar = 'M',
+                        help = 'also group each route set by clusters of pickup and dropoff coordinates M meters wide, see clusterTrips, saving them as analyzedData/<route set>_clusters.csv, matched within --window when given')
+    parser.add_argument('--out-of-core', action = 'store_true',
+                        help = 'analyze one processed file at a time into partial cubes, then merge them, so the trips never have to fit in memory')
+    parser.add_argument('--partials', default = filePath + '/analyzedData/partials',
+                        help = 'folder the partial cubes of each processed file are kept in and reused from, with --out-of-core (default: %(default)s)')
+    args = parser.parse_args()
+    if args.out_of_core and (args.commutes or args.window is not None or args.radius is not None):
+        parser.error('--commutes, --window and --radius need every trip in memory, they cannot be combined with --out-of-core')
+    if args.profile:
+        StageProfiler.enableProfiling()
+
+    if args.out_of_core:
+        #Each processed file is binned on its own, or its partial cubes reused from an earlier run, to be merged below
+        partials = [TripCube.buildPartialCubes(path, args.partials) for path in processedFiles()]
+        keys = list(partials[0]) if partials else []
+    else:
+        with StageProfiler.stage('read') as stage:
+            #Clusters need the coordinates of the trips, of which only the latitudes are read otherwise
+            df = readFiles(analysisColumns + (['pickup_longitude','dropoff_longitude'] if args.radius is not None else []))
+            stage['rows_out'] = len(df)
+
+        #We analyze the data pertaining to the neighborhoods in question.
+        #Every route set is a view of the trips in df, none of them copies it
+        views = StageProfiler.run('routes', None, routeSetViews, df)
+        keys = list(views)
+
+    #Each route set is aggregated into a cube of routes, weeks and intervals, saved as memory mappable arrays for DataVis
+    dfDict = {}
+    for dfkey in keys:
         print('\n' + 'Analyzing commutes: ' + dfkey + '...')
-        df = findCommutes(dfDict[dfkey])
-        df = analyzeMetaData(df)
-        df.to_pickle(filePath +'/analyzedData/' + dfkey)
-        dfDict[dfkey] = df
-        print('It took {0:0.1f} seconds to analyze that file'.format(time.time() - start))
+        if args.out_of_core:
+            with StageProfiler.stage('merge', dfkey, len(partials)):
+                cube = TripCube.mergeCubes([TripCube.loadCube(partial[dfkey]) for partial in partials])
+        else:
+            with StageProfiler.stage('cube', dfkey, len(views[dfkey]['rows'])):
+                cube = TripCube.buildCube(df, view = views[dfkey])
+        with StageProfiler.stage('save', dfkey):
+            TripCube.saveCube(cube, filePath + '/analyzedData/' + dfkey)
+        with StageProfiler.stage('analyze', dfkey):
+            dfDict[dfkey] = TripCube.analyzeCube(cube)
+
+    #The same route sets aggregated with findCommutes, whose metadata matches that of the cubes
+    if args.commutes:
+        analyzeCommutes(df, views, filePath + '/analyzedData')
+    if args.window is not None:
+        analyzeCommutes(df, views, filePath + '/analyzedData', args.window)
+    if args.radius is not None:
+        analyzeCommutes(df, views, filePath + '/analyzedData', args.window, args.radius)
     
     #Finally print a summary of the metadata
     for key in dfDict:
@@ -225,4 +440,5 @@ if __name__ == '__main__':
           str('%.2f' % df.total_fare) + '\n' +
           str('%.2f' % df.taxi_mean_passenger))
     
-    print('It took {0:0.1f} seconds to finish the run.'.format(time.time() - start))
\ No newline at end of file
+    StageProfiler.printReport()
+    StageProfiler.writeReport(args.report, 'DataAnalysis')
\ No newline at end of file
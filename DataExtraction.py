@@ -0,0 +1,515 @@
+#Extracts, cleans, and reverse geocaches the raw .csv taxi files provided by nyc.gov, of any era and taxi color.
+#Dependencies: shapely, pandas, pyarrow, nyc.gov shapefiles and zone lookup .csv, GDAL/OGR to compile the zones on first use
+#Command Line Argument: path to folder containing the raw .csv taxi files, relative to this script.
+#The files may also be gzip, bzip2 or zip compressed, and are then decompressed as they are read, see CompressedFiles.
+#Optionally --stream [--chunksize N] to process each file N rows at a time, keeping memory constant,
+#and --workers N [--partsize MB] to extract files, split into parts of a given size, over N processes.
+#Files already extracted, as recorded in processedData_manifest.json, are skipped unless --force is given.
+#Each run writes a report of the time, rows and memory of every stage of every file to processedData_report.json/.csv,
+#or to --report PATH, and with --profile a cProfile dump of its slowest stage alongside.
+#The layout of each file (pre 2015 trip_data/trip_fare, 2015 to mid 2016 lat/lon, or post July 2016 LocationIDs,
+#for yellow or green cabs) is detected from its header, so a folder may hold files of several eras.
+
+import argparse
+import collections
+import functools
+import glob as glob
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import CompressedFiles
+import RouteTable
+import StageProfiler
+import TripSchema
+import ZoneGeocoder
+
+filePath = os.path.dirname(os.path.realpath(__file__))
+
+taxiShapefilePath = filePath + '/geographicData/taxi_zones/taxi_zones.shp'
+taxiZoneLookupPath = filePath + '/geographicData/taxi_zone_lookup.csv'
+#The routes of interest trips are filtered down to, see RouteTable
+routesPath = filePath + '/routes.json'
+
+#Number of rows read, geocoded and filtered at a time in streaming mode
+defaultChunkSize = 1000000
+
+#Files larger than this many megabytes are split into parts of about this size, each handled by its own worker
+defaultPartSize = 256
+
+#Columns holding only a few hundred distinct zone names, which are stored dictionary encoded
+zoneColumns = TripSchema.zoneColumns
+
+#The processed trips are partitioned into folders by these columns, e.g. color=yellow/year=2015/month=01/
+partitionColumns = ['color','year','month']
+
+#Columns kept from the raw files, under the common names given to them by normalizeHeader
+tripColumns = ['pickup_datetime','dropoff_datetime','passenger_count','trip_distance']
+coordinateColumns = ['pickup_longitude','pickup_latitude','dropoff_longitude','dropoff_latitude']
+locationIDColumns = ['PULocationID','DOLocationID']
+fareColumns = ['payment_type','fare_amount','extra','mta_tax','tip_amount','tolls_amount','improvement_surcharge','total_amount']
+
+#Trips before 2015 are matched to their row of the trip_fare file by their cab, driver and pickup time
+fareKeyColumns = ['medallion','hack_license','pickup_datetime']
+
+#Payment types were abbreviations before 2015, and are numeric codes since
+paymentTypes = {'CRD':1, 'CSH':2, 'NOC':3, 'DIS':4, 'UNK':5}
+
+#Adapters for each layout nyc.gov has published taxi trips in, green and yellow cabs sharing the same columns once normalized.
+#A file matches the adapter whose columns all appear in its header. The zones of its trips are then either reverse geocoded
+#from their 'coordinates' or named from their 'locationIDs'. Trips before 2015 have their fares in a separate trip_fare file,
+#named after the trip_data file, which is read along with it and matched to the trips on their 'key' columns. Columns are renamed and recoded to match later eras where needed.
+#Columns are parsed as TripSchema.csvDtypes, unless the adapter's dtypes say otherwise.
+schemas = [
+    {'name':'Pre2015',
+     'columns':fareKeyColumns + ['dropoff_datetime','passenger_count','trip_time_in_secs','trip_distance'] + coordinateColumns,
+     'zones':'coordinates',
+     'fares':'Pre2015Fare',
+     'key':fareKeyColumns},
+    {'name':'Pre2015Fare',
+     'columns':fareKeyColumns + ['payment_type','fare_amount','surcharge','mta_tax','tip_amount','tolls_amount','total_amount'],
+     'key':fareKeyColumns,
+     'zones':None,
+     'rename':{'surcharge':'extra'},
+     'recode':{'payment_type':paymentTypes},
+     'dtypes':{'payment_type':str}},
+    {'name':'Post2015',
+     'columns':tripColumns + coordinateColumns + fareColumns,
+     'zones':'coordinates'},
+    {'name':'PostJuly2016',
+     'columns':tripColumns + locationIDColumns + fareColumns,
+     'zones':'locationIDs'},
+]
+
+#Header names differ between eras and colors in case, whitespace, and the tpep_/lpep_ prefix of yellow/green datetimes.
+def normalizeHeader(line):
+    names = [name.strip().lower() for name in line.rstrip('\r\n').split(',')]
+    names = [name[len('tpep_'):] if name.startswith(('tpep_','lpep_')) else name for name in names]
+    return [{'pulocationid':'PULocationID','dolocationid':'DOLocationID'}.get(name, name) for name in names]
+
+#Returns the schema adapter of a raw .csv file, along with its normalized header and taxi color,
+#or None if its header doesn't match exactly one adapter.
+def findSchema(a_file):
+    line = CompressedFiles.readHeader(a_file)
+    header = normalizeHeader(line)
+    matches = [schema for schema in schemas if set(schema['columns']) <= set(header)]
+    if len(matches) != 1:
+        return None
+    color = 'green' if 'lpep_' in line.lower() else 'yellow' #Green cab datetimes are lpep_ in every era, trip_data files are yellow
+    return dict(matches[0], header = header, color = color)
+
+#As findSchema, for a file that must have a known layout.
+def detectSchema(a_file):
+    schema = findSchema(a_file)
+    if schema is None:
+        raise Exception("ERROR: the header of " + a_file + " doesn't match any known taxi data layout.")
+    return schema
+
+def parseArguments(description, defaultFolder = None):
+    parser = argparse.ArgumentParser(description = description)
+    if defaultFolder is None:
+        parser.add_argument('rawDataFolder', help = 'path to the folder containing the raw .csv taxi files, relative to the script')
+    else:
+        parser.add_argument('rawDataFolder', nargs = '?', default = defaultFolder, help = 'path to the folder containing the raw .csv taxi files')
+    parser.add_argument('--stream', action = 'store_true',
+                        help = 'read, geocode and filter each file chunk by chunk, so memory stays constant regardless of file size')
+    parser.add_argument('--chunksize', type = int, default = defaultChunkSize,
+                        help = 'number of rows per chunk in streaming mode (default: %(default)s)')
+    parser.add_argument('--workers', type = int, default = 1,
+                        help = 'number of worker processes extracting files in parallel (default: %(default)s)')
+    parser.add_argument('--partsize', type = int, default = defaultPartSize,
+                        help = 'with several workers, files are split into parts of this many megabytes (default: %(default)s)')
+    parser.add_argument('--force', action = 'store_true',
+                        help = 'extract every file again, even those the manifest records as already processed')
+    parser.add_argument('--report', default = None,
+                        help = 'path of the .json run report, also written as .csv (default: processedData_report.json)')
+    parser.add_argument('--profile', action = 'store_true',
+                        help = 'profile each stage with cProfile and write the slowest one next to the report as .prof')
+    return parser.parse_args()
+
+#Yields the trips of a raw .csv file, either all at once or chunksize rows at a time.
+#A part is a (start, end) byte range of the file as given by splitFile, None being the whole file.
+#Compressed files are decompressed in the background as the chunks are parsed.
+#Any other arguments are passed on to pd.read_csv.
+def readChunks(a_file, chunksize = None, part = None, **kwargs):
+    if CompressedFiles.compression(a_file):
+        with CompressedFiles.openStream(a_file) as source:
+            yield from readCsv(source, chunksize, **kwargs)
+        return
+
+    source = a_file
+    if part is not None:
+        start, end = part
+        with open(a_file, 'rb') as f:
+            f.seek(start)
+            source = io.BytesIO(f.read(end - start))
+        #Only the first part holds the header lines
+        if start > 0:
+            kwargs = dict(kwargs, header = None)
+            kwargs.pop('skiprows', None)
+    yield from readCsv(source, chunksize, **kwargs)
+
+def readCsv(source, chunksize = None, **kwargs):
+    if chunksize is None:
+        yield pd.read_csv(source, **kwargs)
+    else:
+        for df in pd.read_csv(source, chunksize = chunksize, **kwargs):
+            yield df
+
+#Splits a file into byte ranges of roughly partBytes each, cut at line endings.
+#Compressed files can't be cut at a byte offset, they are always read whole.
+def splitFile(a_file, partBytes = None):
+    size = os.path.getsize(a_file)
+    if partBytes is None or size <= partBytes or CompressedFiles.compression(a_file):
+        return [None]
+
+    offsets = [0]
+    with open(a_file, 'rb') as f:
+        while offsets[-1] + partBytes < size:
+            f.seek(offsets[-1] + partBytes)
+            f.readline() #Move on to the start of the next line
+            if f.tell() >= size:
+                break
+            offsets.append(f.tell())
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+#Extracts every .csv file of a folder, compressed or not, skipping those already recorded in the manifest of outputFolder.
+#The timings of each stage are reported to report, by default next to outputFolder.
+def cleanData(rawDataFolder, chunksize = None, workers = 1, partBytes = None, force = False, outputFolder = filePath + '/processedData',
+              report = None, profile = False):
+    if profile:
+        StageProfiler.enableProfiling()
+    with StageProfiler.stage('initialize'):
+        all_trip_files, loadZones, manifest = findFiles(rawDataFolder, force, outputFolder)
+    processFiles(all_trip_files, outputFolder, loadZones, chunksize, workers, partBytes, manifest)
+
+    StageProfiler.printReport()
+    StageProfiler.writeReport(report or outputFolder.rstrip('/') + '_report.json', 'DataExtraction')
+
+#Returns the new or changed files of a folder to extract, the function loading the zones they need, and the manifest.
+def findFiles(rawDataFolder, force, outputFolder):
+    #A file matching several patterns is still only extracted once
+    all_trip_files = sorted(set(path for pattern in CompressedFiles.rawFilePatterns
+                                for path in glob.glob(os.path.join(filePath, rawDataFolder, pattern))))
+    fileSchemas = {a_file:findSchema(a_file) for a_file in all_trip_files}
+    #A file of an unknown layout, such as the green cab files of 2013 and 2014 which have no improvement_surcharge,
+    #is skipped rather than aborting the extraction of the others
+    for a_file in all_trip_files:
+        if fileSchemas[a_file] is None:
+            print("The header of " + a_file + " doesn't match any known taxi data layout, skipping it.")
+    #Fare files are read along with their trip files
+    all_trip_files = [a_file for a_file in all_trip_files if fileSchemas[a_file] is not None and fileSchemas[a_file]['name'] != 'Pre2015Fare']
+    #Only new or changed files are extracted, unless the zone or route definitions have changed
+    manifest = loadManifest(outputFolder, zoneVersions(taxiZoneLookupPath, taxiShapefilePath))
+    all_trip_files = newFiles(manifest, all_trip_files, force)
+
+    #Preparing the necessary overhead to reverse geocode from the NYC shapefile, done once in each worker process.
+    #Trips that already come with their LocationIDs only need the zone lookup table.
+    if any(fileSchemas[a_file]['zones'] == 'coordinates' for a_file in all_trip_files):
+        loadZones = functools.partial(ZoneGeocoder.loadZones, taxiShapefilePath, taxiZoneLookupPath)
+    else:
+        loadZones = functools.partial(ZoneGeocoder.loadZoneLookup, taxiZoneLookupPath)
+    return all_trip_files, loadZones, manifest
+
+#Yields the trips of a raw .csv file with the columns its schema adapter keeps, under their common names.
+def readSchema(a_file, schema, chunksize = None, part = None):
+    dtypes = {column:TripSchema.csvDtypes[column] for column in schema['columns'] if column in TripSchema.csvDtypes}
+    dtypes.update(schema.get('dtypes', {}))
+    #The header is given as names, as parts after the first one have none. Blank lines after the header are skipped.
+    for df in readChunks(a_file, chunksize, part, index_col=False, header=None, names=schema['header'], skiprows=1,
+                         usecols=schema['columns'], dtype=dtypes):
+        for column, codes in schema.get('recode', {}).items():
+            df[column] = df[column].str.strip().str.upper().map(codes)
+        #Datetimes are parsed here once, everything downstream works on datetime64 columns
+        for column in TripSchema.datetimeColumns:
+            if column in df.columns:
+                df[column] = TripSchema.parseDatetimes(df[column])
+        yield df[schema['columns']].rename(columns = schema.get('rename', {}))
+
+#Reads, finds the zones of, and filters the trips of a raw .csv file, or of a part of it.
+def readData(a_file, part, zones, chunksize = None):
+    schema = detectSchema(a_file)
+    name = os.path.basename(a_file)
+
+    #Fares are read chunk by chunk in lockstep with the trips
+    fares = openFares(fareFile(a_file), chunksize) if 'fares' in schema else None
+
+    #Each chunk is geocoded and filtered down to our routes of interest before the next one is read
+    df_list = []
+    for df in StageProfiler.iterate('read', name, readSchema(a_file, schema, chunksize, part)):
+        if fares is not None:
+            #The keys of every trip read are kept aside, so that the fares of trips the filter drops can be dropped too
+            keys = df[schema['key']]
+            df = df.drop([column for column in schema['key'] if column not in tripColumns], axis = 1)
+        df = StageProfiler.run('locate', name, locateTrips, df, schema, zones)
+        df = StageProfiler.run('filter', name, filterTrips, df, zones['routes'])
+        df = StageProfiler.run('name', name, nameTrips, df, schema, zones)
+        if fares is not None:
+            df = StageProfiler.run('fares', name, joinFares, df, keys, fares)
+        df_list.append(df)
+    if fares is not None:
+        df_list.append(StageProfiler.run('fares', name, finishFares, fares))
+    return pd.concat(df_list)
+
+#Finds the LocationIDs of the pickup and dropoff zones of a dataframe of trips, whichever way its schema locates them.
+def locateTrips(df, schema, zones):
+    if schema['zones'] == 'coordinates':
+        df['PULocationID'] = ZoneGeocoder.locateZones(df['pickup_longitude'].values, df['pickup_latitude'].values, zones)
+        df['DOLocationID'] = ZoneGeocoder.locateZones(df['dropoff_longitude'].values, df['dropoff_latitude'].values, zones)
+    else:
+        for column in locationIDColumns:
+            df[column] = ZoneGeocoder.cleanLocationIDs(df[column].values, zones)
+    return df
+
+#Names the pickup and dropoff zones of the trips from their LocationIDs, which are then dropped.
+def nameTrips(df, schema, zones):
+    df['pickup_borough'], df['pickup_neighborhood'] = ZoneGeocoder.zoneNames(df['PULocationID'].values, zones)
+    df['dropoff_borough'], df['dropoff_neighborhood'] = ZoneGeocoder.zoneNames(df['DOLocationID'].values, zones)
+    df = df.drop(locationIDColumns, axis = 1)
+    if schema['zones'] != 'coordinates':
+        #Latitude and longitude are no longer reported, missing values keep the columns of every era alike
+        for column in coordinateColumns:
+            df[column] = np.float32(np.nan)
+    return df
+
+#The trip_fare file holding the fares of a trip_data file of trips before 2015
+def fareFile(a_file):
+    return a_file.replace('data','fare')
+
+#The raw files the trips of a file are extracted from: the file itself, and its trip_fare file for trips before 2015
+def sourceFiles(a_file):
+    return [a_file] + ([fareFile(a_file)] if 'fares' in detectSchema(a_file) else [])
+
+#Opens the trip_fare file of trips before 2015, to be read chunk by chunk along with its trip_data file by joinFares.
+#Trips whose fare hasn't been read yet, and fares whose trip hasn't, are kept pending until a later chunk.
+def openFares(fareFile, chunksize = None):
+    schema = detectSchema(fareFile)
+    if schema['name'] != 'Pre2015Fare':
+        raise Exception("ERROR: " + fareFile + " isn't a trip_fare file.")
+    return {'file':fareFile, 'schema':schema, 'chunks':readSchema(fareFile, schema, chunksize), 'trips':None, 'fares':None}
+
+#Hash of the key columns of each row, as a trip_key index
+def hashKeys(df, keyColumns):
+    return pd.Index(pd.util.hash_pandas_object(df[keyColumns], index = False).values, name = 'trip_key')
+
+#Reads the next chunk of fares and joins the filtered trips of a chunk to theirs.
+#keys are the key columns of every trip of the chunk as read, indexed as the trips are.
+#Both files list their trips in the same order, so a chunk of fares normally has the same keys as the chunk of trips,
+#which is checked and joined by position. Otherwise trips and fares are matched on a hash of their keys: fares of trips
+#the filter dropped are dropped as well, while trips and fares whose match hasn't been read yet are kept pending.
+def joinFares(dft, keys, fares, dff = None):
+    keyColumns = fares['schema']['key']
+    dff = next(fares['chunks'], None) if dff is None else dff
+    pending = [frame for frame in [fares['trips'], fares['fares']] if frame is not None and len(frame) > 0]
+    if not pending and dff is not None and len(dff) == len(keys) and all(dff[column].array.equals(keys[column].array) for column in keyColumns):
+        return dft.join(dff.drop(keyColumns, axis = 1).set_axis(keys.index), how = 'inner')
+
+    dft = dft.set_index(hashKeys(keys.loc[dft.index], keyColumns), append = True)
+    if dff is not None:
+        dff = dff.set_index(hashKeys(dff, keyColumns)).drop(keyColumns, axis = 1)
+    dff = pd.concat([frame for frame in [fares['fares'], dff] if frame is not None])
+    dft = pd.concat([frame for frame in [fares['trips'], dft] if frame is not None])
+
+    #The very few trips listed twice are all given the first of their fares
+    dff = dff[~dff.index.duplicated()]
+    tripKeys = dft.index.get_level_values('trip_key')
+    found = tripKeys.isin(dff.index)
+    fares['trips'] = dft[~found]
+    fares['fares'] = dff[~dff.index.isin(hashKeys(keys, keyColumns)) & ~dff.index.isin(tripKeys)]
+    return dft[found].join(dff, on = 'trip_key').droplevel('trip_key')
+
+#Joins the trips still pending once every chunk of trips has been read to the rest of the fares.
+#Trips that have no fare at all are dropped, as the positional join did.
+def finishFares(fares):
+    df_list = []
+    for dff in fares['chunks']:
+        if fares['trips'] is None or len(fares['trips']) == 0:
+            break
+        df_list.append(joinFares(fares['trips'].iloc[:0].droplevel('trip_key'), dff.iloc[:0], fares, dff))
+    if fares['trips'] is not None and len(fares['trips']) > 0:
+        print(str(len(fares['trips'])) + " trips have no fare in " + fares['file'] + ", dropping them.")
+    fares['trips'] = fares['fares'] = None
+    return pd.concat(df_list) if df_list else None
+
+#Only keep trips relevant to the Via challenge, i.e. on any of the routes of routes.json
+def filterTrips(df, routes):
+    return df[RouteTable.classifyTrips(df, routes) != 0]
+
+def writeData(a_file, df, outputFolder):
+    with StageProfiler.stage('write', os.path.basename(a_file), len(df)):
+        removeTrips(a_file, outputFolder)
+        writeTrips(df, a_file, outputFolder, detectSchema(a_file)['color'])
+
+#The zones each worker process loads for itself, memory mapping the compiled zones rather than pickling them over
+workerZones = None
+
+def initWorker(loadZones):
+    global workerZones
+    workerZones = loadZones()
+    #The route table is compiled once per process as well
+    workerZones['routes'] = RouteTable.loadRoutes(routesPath, taxiZoneLookupPath)
+
+def readPart(task):
+    a_file, part, chunksize = task
+    df = readData(a_file, part, workerZones, chunksize)
+    #The stage timings of a worker process travel back with its trips
+    return (a_file, df, StageProfiler.takeRecords())
+
+#Extracts every file to outputFolder, either sequentially or over a pool of worker processes.
+#loadZones is called once per process to prepare the geocoding overhead, and must be picklable with several workers.
+#If a manifest is given, each file is recorded in it once written.
+def processFiles(all_trip_files, outputFolder, loadZones, chunksize = None, workers = 1, partBytes = None, manifest = None):
+    if workers <= 1:
+        initWorker(loadZones)
+        for a_file in all_trip_files:
+            print("reading in " + a_file + "...")
+            a_file, df, records = readPart((a_file, None, chunksize))
+            StageProfiler.addRecords(records)
+            writeData(a_file, df, outputFolder)
+            recordFile(manifest, a_file)
+    else:
+        #Trips before 2015 are read in lockstep with their fares, so those files are never split into parts
+        tasks = [(a_file, part, chunksize) for a_file in all_trip_files
+                 for part in splitFile(a_file, None if 'fares' in detectSchema(a_file) else partBytes)]
+        partCount = collections.Counter(task[0] for task in tasks)
+        print("reading in " + str(len(tasks)) + " parts of " + str(len(all_trip_files)) + " files with " + str(workers) + " workers...")
+
+        #The zones are compiled and rasterized here first if need be, so the workers only ever load them
+        loadZones()
+        pool = multiprocessing.Pool(workers, initWorker, (loadZones,))
+        #Results come back in order, so the parts of each file are contiguous
+        df_list = []
+        for a_file, df, records in pool.imap(readPart, tasks):
+            StageProfiler.addRecords(records)
+            df_list.append(df)
+            if len(df_list) == partCount[a_file]:
+                writeData(a_file, pd.concat(df_list), outputFolder)
+                recordFile(manifest, a_file)
+                df_list = []
+        pool.close()
+        pool.join()
+
+#Writes the trips extracted from a_file to a parquet dataset partitioned by taxi color, year and month of pickup,
+#so that readers can load only the partitions and columns they need. Columns are stored in their TripSchema types.
+#Output files are named after a_file, so extracting a file again overwrites its previous output.
+def writeTrips(df, a_file, outputFolder, color):
+    df = TripSchema.compactTrips(df)
+    pickups = df['pickup_datetime'].dt
+    df = df.assign(color = color,
+                   year = pickups.year,
+                   #Months are zero padded in the partition names, e.g. month=01
+                   month = pd.Categorical.from_codes(pickups.month.fillna(0).astype(int).values - 1, ['{0:02d}'.format(m) for m in range(1, 13)]))
+    table = pa.Table.from_pandas(df, preserve_index = False)
+    name = CompressedFiles.baseName(a_file)
+    pq.write_to_dataset(table, outputFolder, partition_cols = partitionColumns,
+                        basename_template = name + '-{i}.parquet', existing_data_behavior = 'overwrite_or_ignore',
+                        use_dictionary = [column for column in zoneColumns if column in df.columns])
+
+#Removes the output of an earlier extraction of a_file, as the months it spans may have changed since
+def removeTrips(a_file, outputFolder):
+    name = CompressedFiles.baseName(a_file)
+    for path in glob.glob(os.path.join(glob.escape(outputFolder), '**', glob.escape(name) + '-*.parquet'), recursive = True):
+        if re.fullmatch(re.escape(name) + r'-\d+\.parquet', os.path.basename(path)):
+            os.remove(path)
+
+def fileHash(path):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 24), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+#Versions of the zone and route definitions and column types the trips are extracted with.
+#If any of them changes, the outputs extracted with the previous ones must be rebuilt.
+#All are always recorded, as every extraction script writes to the same output folder.
+def zoneVersions(taxiZoneLookupPath, taxiShapefilePath, routesPath = routesPath):
+    return {'zone_lookup':fileHash(taxiZoneLookupPath),
+            'shapefile':ZoneGeocoder.shapefileHash(taxiShapefilePath),
+            'routes':fileHash(routesPath),
+            'columns':{column:str(dtype) for column, dtype in TripSchema.tripDtypes.items()}}
+
+#A short hash of the versions a file was extracted with, recorded with each file of the manifest
+def versionsHash(versions):
+    return hashlib.sha1(json.dumps(versions, sort_keys = True).encode()).hexdigest()
+
+#The manifest lives next to the output folder, and records the size, modification time, content hash and folder
+#of every raw file extracted into it, along with a hash of the zone definitions it was extracted with.
+#If those zone definitions have changed since, only the files being extracted are rebuilt, see newFiles,
+#as the raw files of other folders may not be at hand.
+def loadManifest(outputFolder, versions):
+    path = outputFolder.rstrip('/') + '_manifest.json'
+    manifest = {'versions':versions, 'files':{}, 'version':versionsHash(versions)}
+    if os.path.exists(path):
+        with open(path) as f:
+            stored = json.load(f)
+        manifest['files'] = stored['files']
+        #Files recorded before each had its own versions were all extracted with those of the manifest
+        for entry in manifest['files'].values():
+            entry.setdefault('versions', versionsHash(stored['versions']))
+    manifest['path'] = path
+    return manifest
+
+def saveManifest(manifest):
+    with open(manifest['path'] + '.tmp', 'w') as f:
+        json.dump({'versions':manifest['versions'], 'files':manifest['files']}, f, indent = 1, sort_keys = True)
+    os.replace(manifest['path'] + '.tmp', manifest['path'])
+
+#Whether a raw file has already been extracted as is, along with its trip_fare file for trips before 2015,
+#so that replacing only the fares extracts the trips again.
+def isProcessed(manifest, a_file):
+    return all(isRecorded(manifest, source) for source in sourceFiles(a_file))
+
+#Whether a raw file is recorded in the manifest as is. Files are only hashed when their size matches but their
+#modification time does not, e.g. when copied over again.
+def isRecorded(manifest, a_file):
+    entry = manifest['files'].get(os.path.basename(a_file))
+    if entry is None or entry['versions'] != manifest['version'] or not os.path.exists(a_file):
+        return False
+    stat = os.stat(a_file)
+    if stat.st_size != entry['size']:
+        return False
+    if stat.st_mtime == entry['mtime']:
+        return True
+    if fileHash(a_file) == entry['hash']:
+        entry['mtime'] = stat.st_mtime
+        return True
+    return False
+
+#Returns the files that are new or have changed since they were last extracted, or every file if forced.
+#The entries of files of other folders are kept either way.
+def newFiles(manifest, all_trip_files, force = False):
+    new_files = [a_file for a_file in all_trip_files if force or not isProcessed(manifest, a_file)]
+    saveManifest(manifest) #Keeps the modification times of files that turned out unchanged
+    print(str(len(all_trip_files) - len(new_files)) + " of " + str(len(all_trip_files)) + " files already processed, skipping them.")
+    #Files of other folders extracted with older zone or route definitions are left as they are, but named
+    current = set(os.path.basename(source) for a_file in all_trip_files for source in sourceFiles(a_file))
+    stale = sorted(set(entry.get('folder', 'folders not recorded') for name, entry in manifest['files'].items()
+                       if entry['versions'] != manifest['version'] and name not in current))
+    if stale:
+        print("Zone or route definitions have changed since these folders were extracted, extract them again: " + ', '.join(stale))
+    return new_files
+
+def recordFile(manifest, a_file):
+    if manifest is None:
+        return
+    for source in sourceFiles(a_file):
+        stat = os.stat(source)
+        manifest['files'][os.path.basename(source)] = {'size':stat.st_size, 'mtime':stat.st_mtime, 'hash':fileHash(source),
+                                                       'folder':os.path.dirname(os.path.abspath(source)),
+                                                       'versions':manifest['version']}
+    saveManifest(manifest)
+
+
+if __name__ == '__main__':
+    args = parseArguments('Extracts, cleans, and reverse geocaches raw taxi data of any era.')
+    print("Starting program...")
+
+    cleanData(args.rawDataFolder, args.chunksize if args.stream else None, args.workers, args.partsize*1024*1024, args.force,
+              report = args.report, profile = args.profile)
@@ -9,14 +9,11 @@ import plotly.graph_objs as go
 import plotly.tools as tls
 import cufflinks as cf
 import datetime
+import TripCube
 
 filePath = os.path.dirname(os.path.realpath(__file__))
 weekStart = '2016-01-03 00:00:00'
 
-def parseWeekMinutes(string):
-    string = string.lstrip('(').rstrip(']').split(', ')
-    return (float(string[0])+float(string[1]))/2*60
-
 def plotWeek(df):
     
     data = [{
@@ -44,18 +41,15 @@ def to_unix_time(dt):
     return (dt - epoch).total_seconds() * 1000    
 
 if __name__ == '__main__':
-    df = pd.read_pickle(filePath + '/../analyzedDataJan2016/AM')
-
-    
-    df = df[((df['dropoff_neighborhood'].isin(['World Trade Center'])) 
-                & (df['pickup_neighborhood'].isin(['Astoria Park'])))]
+    #The route and week in question are a single run of cells of the memory mapped analysis cube
+    cube = TripCube.loadCube(filePath + '/../analyzedDataJan2016/AM')
+    route = TripCube.routeIndex(cube, 'Astoria Park', 'World Trade Center')
+    week = TripCube.weekIndex(cube, weekStart)
 
-    df = df.loc[weekStart]
-    df['week_minutes'] = df.index.get_level_values('week_minutes') 
-    df['week_seconds'] = df['week_minutes'].apply(parseWeekMinutes)
-    halfInterval = df['week_minutes'][0]
+    df = pd.DataFrame({'passenger_count':TripCube.routeWeek(cube, 'passenger_count', route, week)})
+    df['week_seconds'] = TripCube.cubeIntervals(cube).mid.values*60
     df['datetime'] = pd.to_datetime(weekStart)
-    df['half_interval'] = 7.5*60
+    df['half_interval'] = cube['interval']/2*60
 
     df.datetime = df.datetime + df.week_seconds.values.astype('timedelta64[s]') 
     df.datetime = df.datetime + df.half_interval.values.astype('timedelta64[s]') 
@@ -0,0 +1,162 @@
+#Sweeps the carpool analysis over grids of its parameters
+#Dependencies: numpy, pandas
+#The trips are read and separated into route sets once, as views of the one frame of trips, then binned into cubes at the finest interval dividing every
+#interval of the sweep. Each combination coarsens those cubes rather than binning the raw trips again, so only
+#the LGA time shifts, which move trips across bins, are binned once per distinct offset. The binned cubes hold only their
+#occupied cells and are saved to a temporary folder, which the workers memory map, each coarsening them one interval at a time.
+#Every combination of carpoolGoal, intervalWeekMinutes, LGAtoAstoria and UpperManhattanToAstoria is evaluated
+#over a pool of worker processes, giving one table of the reductions of each route for each parameter set.
+
+import pandas as pd
+import numpy as np
+import argparse
+import itertools
+import multiprocessing
+import os
+import tempfile
+import DataAnalysis
+import StageProfiler
+import TripCube
+
+filePath = os.path.dirname(os.path.realpath(__file__))
+
+#The route sets analyzed on their own, AAll being built from the LGA traffic as in DataAnalysis.findCommuteAirport
+routeSetNames = ['AA','AM','MA','AAll','UMid','MidU','UU']
+airportSetNames = ['AM','MA','LA','AL']
+
+#The columns of the table, one row per route per parameter set
+parameterColumns = ['goal','interval','lga','upper']
+resultColumns = ['route_set','pickup_neighborhood','dropoff_neighborhood','taxi_count','carpool_count',
+                 'car_reduction_ratio','miles_reduction','CO2_reduction']
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description = 'Sweeps the carpool analysis over grids of its parameters.')
+    parser.add_argument('--goals', type = int, nargs = '+', default = [DataAnalysis.carpoolGoal],
+                        help = 'passengers per carpool to sweep over (default: %(default)s)')
+    parser.add_argument('--intervals', type = int, nargs = '+', default = [DataAnalysis.intervalWeekMinutes],
+                        help = 'minutes a carpool waits to gather its passengers to sweep over (default: %(default)s)')
+    parser.add_argument('--lga', type = int, nargs = '+', default = [DataAnalysis.LGAtoAstoria],
+                        help = 'minutes from LGA to Astoria to sweep over (default: %(default)s)')
+    parser.add_argument('--upper', type = int, nargs = '+', default = [DataAnalysis.UpperManhattanToAstoria],
+                        help = 'minutes from Upper Manhattan to Astoria to sweep over (default: %(default)s)')
+    parser.add_argument('--sets', nargs = '+', default = routeSetNames, choices = routeSetNames,
+                        help = 'route sets to analyze (default: all of them)')
+    parser.add_argument('--workers', type = int, default = 1,
+                        help = 'number of worker processes evaluating parameter sets in parallel (default: %(default)s)')
+    parser.add_argument('--output', default = filePath + '/analyzedData/parameterSweep.csv',
+                        help = 'path of the .csv table of results (default: %(default)s)')
+    parser.add_argument('--report', default = None,
+                        help = 'path of the .json run report, also written as .csv (default: next to the output, as _report.json)')
+    parser.add_argument('--profile', action = 'store_true',
+                        help = 'profile each stage with cProfile and write the slowest one next to the report as .prof')
+    return parser.parse_args()
+
+#The finest interval every interval of the sweep is a multiple of
+def baseInterval(intervals):
+    return int(np.gcd.reduce(np.array(intervals)))
+
+#The folder of cubesFolder a binned cube is saved in, ('LU', 20) being saved as LU_20
+def cubeFolder(cubesFolder, key):
+    return os.path.join(cubesFolder, key if isinstance(key, str) else key[0] + '_' + str(key[1]))
+
+#Bins the trips of df in each route set once at the base interval, saving each cube in cubesFolder as soon as it is built
+#so only one is held in memory. The LGA to/from Upper Manhattan trips are binned once per offset they are shifted by, keyed by (set, offset).
+def binRouteSets(df, routeSets, interval, cubesFolder, sets = routeSetNames, lgaOffsets = [], upperOffsets = []):
+    views = {key:routeSets[key] for key in set(sets) - {'AAll'}}
+    if 'AAll' in sets:
+        views.update({key:routeSets[key] for key in airportSetNames})
+        views.update({('LU', offset):DataAnalysis.shiftToAstoria(routeSets['LU'], offset) for offset in set(lgaOffsets)})
+        views.update({('UL', offset):DataAnalysis.shiftToAstoria(routeSets['UL'], offset) for offset in set(upperOffsets)})
+    for key, view in views.items():
+        TripCube.saveCube(TripCube.buildCube(df, interval, view), cubeFolder(cubesFolder, key))
+
+#The binned cubes each worker process evaluates parameter sets from: the folder they are saved in, memory mapped rather
+#than pickled to each worker, and those coarsened to the interval being evaluated, dropped once a task is at another interval
+workerCubes = {'folder':None, 'interval':None, 'cubes':{}}
+
+def initWorker(cubesFolder):
+    workerCubes.update(folder = cubesFolder, interval = None, cubes = {})
+
+#The binned cube of key coarsened to interval, only the cubes of one interval being kept at a time
+def coarseCube(key, interval):
+    if workerCubes['interval'] != interval:
+        workerCubes.update(interval = interval, cubes = {})
+    if key not in workerCubes['cubes']:
+        cube = TripCube.loadCube(cubeFolder(workerCubes['folder'], key), mmap_mode = 'r')
+        workerCubes['cubes'][key] = cube if cube['interval'] == interval else TripCube.coarsenCube(cube, interval)
+    return workerCubes['cubes'][key]
+
+#The reductions of each route of the given sets under one set of parameters, from the cubes binned by binRouteSets.
+#The parts of AAll are coarsened before they are merged, as the coarse cubes are the smaller ones.
+def evaluateParameters(sets, goal, interval, lga, upper):
+    df_list = []
+    for key in sets:
+        if key == 'AAll':
+            cube = TripCube.mergeCubes([coarseCube(k, interval) for k in airportSetNames + [('LU', lga), ('UL', upper)]])
+        else:
+            cube = coarseCube(key, interval)
+        df = TripCube.analyzeRoutes(cube, goal)
+        df.insert(0, 'route_set', key)
+        df_list.append(df)
+    df = pd.concat(df_list, ignore_index = True)
+    for column, value in zip(parameterColumns, [goal, interval, lga, upper]):
+        df[column] = value
+    return df[parameterColumns + resultColumns]
+
+def evaluateTask(task):
+    return evaluateParameters(*task)
+
+#Evaluates every combination of the given parameters over the route sets of df, either sequentially or over a pool of worker processes.
+#The binned cubes are saved in a temporary folder of cubesFolder, or of the system's, and removed once evaluated.
+#Returns one table of the reductions of every route for every combination.
+def sweepParameters(df, routeSets, goals, intervals, lgaOffsets, upperOffsets, sets = routeSetNames, workers = 1, cubesFolder = None):
+    if cubesFolder is not None:
+        os.makedirs(cubesFolder, exist_ok = True)
+    with tempfile.TemporaryDirectory(prefix = 'sweepCubes', dir = cubesFolder) as folder:
+        with StageProfiler.stage('bin'):
+            binRouteSets(df, routeSets, baseInterval(intervals), folder, sets, lgaOffsets, upperOffsets)
+
+        #Route sets other than AAll do not depend on the LGA offsets, they are evaluated once per goal and interval.
+        #Tasks are ordered by interval so each worker coarsens the cubes of one interval at a time.
+        tasks = []
+        for interval, goal in itertools.product(intervals, goals):
+            otherSets = [key for key in sets if key != 'AAll']
+            if otherSets:
+                tasks.append((otherSets, goal, interval, lgaOffsets[0], upperOffsets[0]))
+            if 'AAll' in sets:
+                tasks += [(['AAll'], goal, interval, lga, upper) for lga, upper in itertools.product(lgaOffsets, upperOffsets)]
+        print('evaluating ' + str(len(tasks)) + ' parameter sets with ' + str(workers) + ' workers...')
+
+        with StageProfiler.stage('evaluate', None, len(tasks)):
+            if workers <= 1:
+                initWorker(folder)
+                df_list = [evaluateTask(task) for task in tasks]
+                initWorker(None)
+            else:
+                pool = multiprocessing.Pool(workers, initWorker, (folder,))
+                df_list = list(pool.imap(evaluateTask, tasks))
+                pool.close()
+                pool.join()
+
+    df = pd.concat(df_list, ignore_index = True)
+    #Offsets only apply to AAll, they are left blank for the other sets
+    df[['lga','upper']] = df[['lga','upper']].astype('Int64')
+    df.loc[df['route_set'] != 'AAll', ['lga','upper']] = pd.NA
+    return df.sort_values(['route_set'] + parameterColumns, kind = 'stable').reset_index(drop = True)
+
+if __name__ == '__main__':
+    args = parseArguments()
+    if args.profile:
+        StageProfiler.enableProfiling()
+    with StageProfiler.stage('read') as stage:
+        df = DataAnalysis.readFiles()
+        stage['rows_out'] = len(df)
+    routeSets = StageProfiler.run('routes', None, DataAnalysis.findRouteSets, df)
+
+    df = sweepParameters(df, routeSets, args.goals, args.intervals, args.lga, args.upper, args.sets, args.workers,
+                         os.path.dirname(args.output))
+    os.makedirs(os.path.dirname(args.output), exist_ok = True)
+    df.to_csv(args.output, index = False)
+    print('Wrote ' + str(len(df)) + ' rows to ' + args.output)
+    StageProfiler.printReport()
+    StageProfiler.writeReport(args.report or os.path.splitext(args.output)[0] + '_report.json', 'ParameterSweep')
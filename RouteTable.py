@@ -0,0 +1,92 @@
+#Compiles the routes we analyze into a table of zone pairs, so trips are classified by indexing it with their LocationIDs.
+#Dependencies: numpy, pandas, nyc.gov zone lookup .csv
+#Routes are defined in routes.json between regions, which are lists of taxi zones or whole boroughs. Each route is a bit
+#of a [pickup LocationID, dropoff LocationID] table of bitmasks, set for every pair of zones it covers. A route can also
+#require its pickup or dropoff to be north of a latitude, which the table cannot tell and is checked on the trip's coordinates.
+#New regions and routes only need an edit of routes.json.
+
+import numpy as np
+import pandas as pd
+import json
+import os
+
+filePath = os.path.dirname(os.path.realpath(__file__))
+routesPath = filePath + '/routes.json'
+taxiZoneLookupPath = filePath + '/geographicData/taxi_zone_lookup.csv'
+
+#Latitude requirements a route may have, and the trip column each is checked on
+latitudeChecks = {'min_pickup_latitude':'pickup_latitude', 'min_dropoff_latitude':'dropoff_latitude'}
+
+#Reads the route definitions and compiles them against the zone lookup table.
+def loadRoutes(routesPath = routesPath, taxiZoneLookupPath = taxiZoneLookupPath):
+    with open(routesPath) as f:
+        config = json.load(f)
+    #The lookup has a zone literally named 'NA', which pandas would otherwise read as missing
+    zoneLookup = pd.read_csv(taxiZoneLookupPath, index_col = 0, header=0, keep_default_na=False)
+    return buildRoutes(config, zoneLookup)
+
+def buildRoutes(config, zoneLookup):
+    names = list(config['routes'])
+    if len(names) > 32:
+        raise Exception("ERROR: at most 32 routes can be defined, " + str(len(names)) + " are.")
+
+    #Each region is resolved to the LocationIDs of its zones, LocationID 0 being no zone at all
+    size = int(zoneLookup.index.max()) + 1
+    regions = {}
+    for region, definition in config['regions'].items():
+        inRegion = zoneLookup['Zone'].isin(definition.get('zones', [])) | zoneLookup['Borough'].isin(definition.get('boroughs', []))
+        unknown = set(definition.get('zones', [])) - set(zoneLookup['Zone'])
+        if unknown:
+            raise Exception("ERROR: region " + region + " has zones missing from the zone lookup: " + ', '.join(sorted(unknown)))
+        regions[region] = zoneLookup.index.values[inRegion.values]
+
+    table = np.zeros((size, size), dtype = np.uint32)
+    checks = []
+    for bit, name in enumerate(names):
+        route = config['routes'][name]
+        table[np.ix_(regions[route['pickup']], regions[route['dropoff']])] |= np.uint32(1 << bit)
+        checks += [(bit, column, route[key]) for key, column in latitudeChecks.items() if key in route]
+
+    #Zone names map back to a LocationID, for trips that were only stored with their names.
+    #The few names shared by several LocationIDs are always within one borough, so any of them classifies alike.
+    zoneIDs = pd.Series(zoneLookup.index.values, index = zoneLookup['Zone'].values)
+    return {'names':names,
+            'table':table,
+            'checks':checks,
+            'regions':{region:zoneLookup.loc[ids, 'Zone'].tolist() for region, ids in regions.items()},
+            'zoneIDs':zoneIDs[~zoneIDs.index.duplicated()]}
+
+#Returns the bitmask of the routes each trip is on, from its pickup and dropoff LocationIDs,
+#clearing the bits of routes whose latitude requirement the trip does not meet.
+#Trips without coordinates, i.e. since July 2016, never meet a latitude requirement.
+def classifyTrips(df, routes, pickupIDs = None, dropoffIDs = None):
+    table = routes['table']
+    pickupIDs = df['PULocationID'].values if pickupIDs is None else pickupIDs
+    dropoffIDs = df['DOLocationID'].values if dropoffIDs is None else dropoffIDs
+    pickupIDs = np.where((pickupIDs >= 0) & (pickupIDs < len(table)), pickupIDs, 0)
+    dropoffIDs = np.where((dropoffIDs >= 0) & (dropoffIDs < len(table)), dropoffIDs, 0)
+    bits = table[pickupIDs, dropoffIDs]
+
+    for bit, column, latitude in routes['checks']:
+        onRoute = (bits >> bit) & 1 == 1
+        if not onRoute.any():
+            continue
+        if column in df.columns:
+            onRoute &= ~(df[column].values >= latitude)
+        bits[onRoute] &= ~np.uint32(1 << bit)
+    return bits
+
+#The same bitmask for trips stored with the names of their zones, as in the processed trips.
+def classifyNamedTrips(df, routes):
+    return classifyTrips(df, routes, zoneIDs(df['pickup_neighborhood'], routes), zoneIDs(df['dropoff_neighborhood'], routes))
+
+#LocationIDs of a column of zone names, looking up each distinct name once. Unknown names are LocationID 0.
+def zoneIDs(names, routes):
+    names = pd.Categorical(names)
+    #Missing names have code -1, which picks the trailing 0
+    ids = np.append(routes['zoneIDs'].reindex(names.categories).fillna(0).values.astype(np.intp), 0)
+    return ids[names.codes]
+
+#Whether each trip is on the given route, from the bitmask of classifyTrips
+def onRoute(bits, routes, name):
+    return (bits >> routes['names'].index(name)) & 1 == 1
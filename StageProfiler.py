@@ -0,0 +1,172 @@
+#Lightweight timing of the named stages of the extraction and analysis scripts.
+#Dependencies: standard library only
+#Each stage is timed per file or route it works on (its label), along with the rows it takes in and gives out and the
+#peak resident memory of the process so far. Calls of a stage on the same label are added up, so the chunks and parts
+#of a file are reported together, and worker processes hand their records back with takeRecords to be merged.
+#writeReport saves the records as JSON and CSV, and when profiling is enabled, a cProfile dump of the stage that took
+#longest. Only stages run in the main process are profiled.
+
+import collections
+import contextlib
+import cProfile
+import csv
+import json
+import os
+import sys
+import time
+try:
+    import resource
+except ImportError: #Not available on Windows, where peak memory isn't reported
+    resource = None
+
+#Records of this process, keyed by stage and label. A forked worker process starts with none of its parent's.
+records = collections.OrderedDict()
+recordsPid = os.getpid()
+
+#cProfile of each stage, when profiling is enabled, and the one currently running, as they cannot be nested.
+#profiling is the process that enabled it, worker processes are not profiled.
+profiles = {}
+profiling = None
+activeProfile = None
+
+runStart = time.time()
+
+recordColumns = ['stage','label','calls','seconds','rows_in','rows_out','rows_per_second','peak_rss_mb','pid']
+
+def enableProfiling():
+    global profiling
+    profiling = os.getpid()
+
+#Peak resident memory of this process so far, in megabytes
+def peakRSS():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak/1024/1024 if sys.platform == 'darwin' else peak/1024 #Bytes on macOS, kilobytes elsewhere
+
+#Rows of a frame or array, None for anything else
+def rowsOf(result):
+    shape = getattr(result, 'shape', None)
+    return shape[0] if shape else None
+
+def addRecord(stage, label, seconds, rowsIn = None, rowsOut = None, calls = 1, peak = None, pid = None):
+    global recordsPid
+    if recordsPid != os.getpid():
+        records.clear()
+        recordsPid = os.getpid()
+    record = records.setdefault((stage, label), {'stage':stage, 'label':label, 'calls':0, 'seconds':0.0,
+                                                 'rows_in':None, 'rows_out':None, 'peak_rss_mb':None, 'pid':pid or os.getpid()})
+    record['calls'] += calls
+    record['seconds'] += seconds
+    for column, rows in [('rows_in', rowsIn), ('rows_out', rowsOut)]:
+        if rows is not None:
+            record[column] = (record[column] or 0) + int(rows)
+    peak = peakRSS() if peak is None else peak
+    if peak is not None:
+        record['peak_rss_mb'] = max(record['peak_rss_mb'] or 0, peak)
+
+#Times the body of a with statement as a stage. The rows it gives out can be set on the record it yields.
+@contextlib.contextmanager
+def stage(name, label = None, rowsIn = None):
+    global activeProfile
+    record = {'rows_out':None}
+    profile = None
+    if profiling == os.getpid() and activeProfile is None:
+        profile = activeProfile = profiles.setdefault(name, cProfile.Profile())
+        profile.enable()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start
+        if profile is not None:
+            profile.disable()
+            activeProfile = None
+        addRecord(name, label, seconds, rowsIn, record['rows_out'])
+
+#Runs func(data, *args) as a stage, counting the rows of data in and of the result out.
+def run(name, label, func, data, *args, **kwargs):
+    with stage(name, label, rowsOf(data)) as record:
+        result = func(data, *args, **kwargs)
+        record['rows_out'] = rowsOf(result)
+    return result
+
+#Yields the items of an iterable, timing the production of each one as a stage, e.g. reading the chunks of a file.
+def iterate(name, label, iterable):
+    iterator = iter(iterable)
+    while True:
+        with stage(name, label) as record:
+            item = next(iterator, StopIteration)
+            record['rows_out'] = rowsOf(item)
+        if item is StopIteration:
+            return
+        yield item
+
+#Returns the records of this process and clears them, for a worker process to hand back to the main one.
+def takeRecords():
+    if recordsPid != os.getpid():
+        return []
+    taken = list(records.values())
+    records.clear()
+    return taken
+
+def addRecords(taken):
+    for record in taken:
+        addRecord(record['stage'], record['label'], record['seconds'], record['rows_in'], record['rows_out'],
+                  record['calls'], record['peak_rss_mb'], record['pid'])
+
+def report():
+    rows = []
+    for record in records.values():
+        count = record['rows_in'] if record['rows_in'] is not None else record['rows_out']
+        rows.append(dict(record, rows_per_second = count/record['seconds'] if count is not None and record['seconds'] > 0 else None))
+    return rows
+
+#Totals of each stage over all of its labels
+def stageTotals():
+    totals = collections.OrderedDict()
+    for record in report():
+        total = totals.setdefault(record['stage'], {'stage':record['stage'], 'calls':0, 'seconds':0.0, 'rows_in':None, 'rows_out':None, 'peak_rss_mb':None})
+        total['calls'] += record['calls']
+        total['seconds'] += record['seconds']
+        for column in ['rows_in','rows_out']:
+            if record[column] is not None:
+                total[column] = (total[column] or 0) + record[column]
+        if record['peak_rss_mb'] is not None:
+            total['peak_rss_mb'] = max(total['peak_rss_mb'] or 0, record['peak_rss_mb'])
+    return list(totals.values())
+
+def printReport():
+    print('\n{0:<12}{1:>8}{2:>10}{3:>14}{4:>14}{5:>14}{6:>10}'.format('Stage','Calls','Seconds','Rows in','Rows out','Rows/s','Peak MB'))
+    for total in stageTotals():
+        rows = total['rows_in'] if total['rows_in'] is not None else total['rows_out']
+        print('{0:<12}{1:>8}{2:>10.2f}{3:>14}{4:>14}{5:>14}{6:>10}'.format(total['stage'], total['calls'], total['seconds'],
+              '' if total['rows_in'] is None else total['rows_in'], '' if total['rows_out'] is None else total['rows_out'],
+              '' if rows is None or total['seconds'] == 0 else '{0:0.0f}'.format(rows/total['seconds']),
+              '' if total['peak_rss_mb'] is None else '{0:0.0f}'.format(total['peak_rss_mb'])))
+    print('It took {0:0.1f} seconds in total, with a peak of {1} MB resident.'.format(time.time() - runStart,
+          '?' if peakRSS() is None else '{0:0.0f}'.format(peakRSS())))
+
+#Writes the run report to path (.json) and alongside it as .csv, and when profiling, the cProfile of the stage that
+#took longest as .prof, which can be read with pstats or snakeviz.
+def writeReport(path, script):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+    base = os.path.splitext(path)[0]
+    rows = report()
+    with open(base + '.json', 'w') as f:
+        json.dump({'script':script,
+                   'started':time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(runStart)),
+                   'seconds':time.time() - runStart,
+                   'peak_rss_mb':peakRSS(),
+                   'stages':stageTotals(),
+                   'records':rows}, f, indent = 1)
+    with open(base + '.csv', 'w', newline = '') as f:
+        writer = csv.DictWriter(f, fieldnames = recordColumns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    if profiles:
+        hottest = max(stageTotals(), key = lambda total: total['seconds'] if total['stage'] in profiles else -1)['stage']
+        profiles[hottest].dump_stats(base + '.prof')
+        print('Wrote the profile of the ' + hottest + ' stage to ' + base + '.prof')
+    print('Wrote the run report to ' + base + '.json')
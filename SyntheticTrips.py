@@ -0,0 +1,248 @@
+#Generates synthetic taxi trip .csv files in the column layout of each era of nyc.gov's data, for benchmarking offline.
+#Dependencies: shapely, numpy, pandas, nyc.gov shapefiles and zone lookup .csv, GDAL/OGR to compile the zones on first use
+#Command Line Arguments: folder to write the files to, relative to this script, optionally --rows N per file,
+#--layouts to generate only some of them, --seed for the random generator and --route-share, the share of trips
+#between the zones of the routes in routes.json (the rest are between any zones of the lookup).
+#LocationIDs are drawn from the zone lookup table, and coordinates are sampled inside the real polygon of the zone,
+#so that geocoding a file finds the zones it was generated with. Files are written chunkRows trips at a time.
+
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import shapely
+import DataExtraction
+import RouteTable
+import ZoneGeocoder
+
+filePath = os.path.dirname(os.path.realpath(__file__))
+taxiShapefilePath = filePath + '/geographicData/taxi_zones/taxi_zones.shp'
+taxiZoneLookupPath = filePath + '/geographicData/taxi_zone_lookup.csv'
+
+#Number of trips generated and written at a time
+chunkRows = 1000000
+
+#Headers of each layout as published, their file name and the month their trips are in.
+#Trips before 2015 come as a trip_data file and a trip_fare file of the same trips in the same order.
+layouts = {
+    'Pre2015':{'file':'trip_data_1.csv', 'month':'2013-01',
+               'header':['medallion',' hack_license',' vendor_id',' rate_code',' store_and_fwd_flag',' pickup_datetime',' dropoff_datetime',
+                         ' passenger_count',' trip_time_in_secs',' trip_distance',' pickup_longitude',' pickup_latitude',
+                         ' dropoff_longitude',' dropoff_latitude'],
+               'fares':{'file':'trip_fare_1.csv',
+                        'header':['medallion',' hack_license',' vendor_id',' pickup_datetime',' payment_type',' fare_amount',
+                                  ' surcharge',' mta_tax',' tip_amount',' tolls_amount',' total_amount']}},
+    'YellowPost2015':{'file':'yellow_tripdata_2015-01.csv', 'month':'2015-01',
+                      'header':['VendorID','tpep_pickup_datetime','tpep_dropoff_datetime','passenger_count','trip_distance',
+                                'pickup_longitude','pickup_latitude','RateCodeID','store_and_fwd_flag','dropoff_longitude',
+                                'dropoff_latitude','payment_type','fare_amount','extra','mta_tax','tip_amount','tolls_amount',
+                                'improvement_surcharge','total_amount']},
+    'GreenPost2015':{'file':'green_tripdata_2015-01.csv', 'month':'2015-01',
+                     'header':['VendorID','lpep_pickup_datetime','Lpep_dropoff_datetime','Store_and_fwd_flag','RateCodeID',
+                               'Pickup_longitude','Pickup_latitude','Dropoff_longitude','Dropoff_latitude','Passenger_count',
+                               'Trip_distance','Fare_amount','Extra','MTA_tax','Tip_amount','Tolls_amount','Ehail_fee',
+                               'improvement_surcharge','Total_amount','Payment_type','Trip_type ']},
+    'YellowPostJuly2016':{'file':'yellow_tripdata_2016-07.csv', 'month':'2016-07',
+                          'header':['VendorID','tpep_pickup_datetime','tpep_dropoff_datetime','passenger_count','trip_distance',
+                                    'RatecodeID','store_and_fwd_flag','PULocationID','DOLocationID','payment_type','fare_amount',
+                                    'extra','mta_tax','tip_amount','tolls_amount','improvement_surcharge','total_amount']},
+    'GreenPostJuly2016':{'file':'green_tripdata_2016-07.csv', 'month':'2016-07',
+                         'header':['VendorID','lpep_pickup_datetime','lpep_dropoff_datetime','store_and_fwd_flag','RatecodeID',
+                                   'PULocationID','DOLocationID','passenger_count','trip_distance','fare_amount','extra','mta_tax',
+                                   'tip_amount','tolls_amount','ehail_fee','improvement_surcharge','total_amount','payment_type','trip_type'],},
+}
+
+#Values of the columns no stage of ours reads, under their normalized names
+fillers = {'vendorid':2, 'vendor_id':'VTS', 'ratecodeid':1, 'rate_code':1, 'store_and_fwd_flag':'N', 'ehail_fee':'', 'trip_type':1}
+
+#Passengers per trip and how often each occurs, roughly as in a month of yellow cabs
+passengerCounts = np.array([1,2,3,4,5,6], dtype = np.uint8)
+passengerShares = np.array([0.70,0.14,0.04,0.02,0.06,0.04])
+
+#Number of distinct cabs and drivers the trips before 2015 are spread over, both drawn from the same pool of hashes
+medallionCount = 13000
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description = 'Generates synthetic taxi trip .csv files in the layout of each era of nyc.gov data.')
+    parser.add_argument('outputFolder', help = 'folder to write the .csv files to, relative to this script')
+    parser.add_argument('--rows', type = int, default = 100000, help = 'number of trips per file (default: %(default)s)')
+    parser.add_argument('--layouts', nargs = '+', default = list(layouts), choices = list(layouts),
+                        help = 'layouts to generate a file of (default: all of them)')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the random generator (default: %(default)s)')
+    parser.add_argument('--route-share', type = float, default = 0.5,
+                        help = 'share of trips between the zones of our routes, the rest being between any zones (default: %(default)s)')
+    return parser.parse_args()
+
+#Everything the trips are drawn from: the LocationIDs of the lookup, the pairs of LocationIDs on any of our routes,
+#and, when coordinates are needed, the polygon of each LocationID.
+def loadZoneSampler(coordinates = True, routesPath = RouteTable.routesPath):
+    zoneLookup = pd.read_csv(taxiZoneLookupPath, index_col = 0, header=0, keep_default_na=False)
+    routes = RouteTable.loadRoutes(routesPath, taxiZoneLookupPath)
+    sampler = {'locationIDs':zoneLookup.index.values,
+               'routePairs':np.argwhere(routes['table'] != 0),
+               'medallions':pd.Index([bytes.hex(rng.bytes(16)).upper() for rng in [np.random.default_rng(0)] for i in range(medallionCount)])}
+    if coordinates:
+        zones = ZoneGeocoder.loadCompiledZones(taxiShapefilePath, taxiZoneLookupPath)
+        polygons, locationIDs = zones['polygons'], np.asarray(zones['locationIDs'])
+        #The few LocationIDs split over several features are sampled in their largest one
+        order = np.argsort(shapely.area(polygons))
+        polygonOf = np.full(sampler['locationIDs'].max() + 1, None, dtype = object)
+        polygonOf[locationIDs[order]] = polygons[order]
+        sampler['polygons'] = polygonOf
+        #Trips between zones without a polygon, such as the unknown zones 264 and 265, cannot be given coordinates
+        sampler['locationIDs'] = sampler['locationIDs'][pd.notna(polygonOf[sampler['locationIDs']])]
+        sampler['routePairs'] = sampler['routePairs'][pd.notna(polygonOf[sampler['routePairs']]).all(axis = 1)]
+    return sampler
+
+#Pickup and dropoff LocationIDs of rows trips, a share of them on our routes
+def sampleZones(rows, sampler, rng, routeShare = 0.5):
+    pairs = sampler['routePairs'][rng.integers(0, len(sampler['routePairs']), rows)]
+    onRoute = rng.random(rows) < routeShare
+    pickupIDs = np.where(onRoute, pairs[:,0], rng.choice(sampler['locationIDs'], rows))
+    dropoffIDs = np.where(onRoute, pairs[:,1], rng.choice(sampler['locationIDs'], rows))
+    return pickupIDs, dropoffIDs
+
+#Random longitudes and latitudes, each inside the polygon of its LocationID, by rejection within the polygon's bounds.
+def samplePoints(locationIDs, sampler, rng):
+    lon = np.empty(len(locationIDs))
+    lat = np.empty(len(locationIDs))
+    order = np.argsort(locationIDs, kind = 'stable')
+    ids, starts, counts = np.unique(locationIDs[order], return_index = True, return_counts = True)
+    for locationID, start, count in zip(ids, starts, counts):
+        polygon = sampler['polygons'][locationID]
+        west, south, east, north = polygon.bounds
+        ratio = max(shapely.area(polygon)/((east - west)*(north - south)), 0.05)
+        inside = []
+        found = 0
+        while found < count:
+            x = rng.uniform(west, east, int((count - found)/ratio*1.2) + 16)
+            y = rng.uniform(south, north, len(x))
+            hit = shapely.contains_xy(polygon, x, y)
+            inside.append((x[hit], y[hit]))
+            found += hit.sum()
+        rows = order[start:start + count]
+        lon[rows] = np.concatenate([x for x, y in inside])[:count]
+        lat[rows] = np.concatenate([y for x, y in inside])[:count]
+    return lon, lat
+
+#rows random trips in a month, under the normalized column names of DataExtraction.
+#Coordinates are only sampled when the sampler has the zone polygons.
+def syntheticTrips(rows, month, sampler, rng, routeShare = 0.5):
+    monthStart = pd.Timestamp(month)
+    monthSeconds = int((monthStart + pd.offsets.MonthBegin() - monthStart).total_seconds())
+    pickups = monthStart + pd.to_timedelta(rng.integers(0, monthSeconds, rows), unit = 's')
+    distance = rng.lognormal(0.7, 0.8, rows).round(2)
+    seconds = (distance*rng.uniform(150, 400, rows)).round() + 60
+    fare = (2.5 + 2.5*distance + rng.normal(0, 1, rows)).clip(2.5).round(1)
+    extra = rng.choice([0.0, 0.5, 1.0], rows)
+    payment = rng.choice([1, 2], rows, p = [0.6, 0.4])
+    tip = np.where(payment == 1, (fare*rng.uniform(0.1, 0.25, rows)).round(2), 0.0)
+    tolls = np.where(rng.random(rows) < 0.05, 5.54, 0.0)
+    pickupIDs, dropoffIDs = sampleZones(rows, sampler, rng, routeShare)
+
+    df = pd.DataFrame({'pickup_datetime':pickups,
+                       'dropoff_datetime':pickups + pd.to_timedelta(seconds, unit = 's'),
+                       'passenger_count':rng.choice(passengerCounts, rows, p = passengerShares),
+                       'trip_time_in_secs':seconds.astype(int),
+                       'trip_distance':distance,
+                       'PULocationID':pickupIDs,
+                       'DOLocationID':dropoffIDs,
+                       'payment_type':payment,
+                       'fare_amount':fare,
+                       'extra':extra,
+                       'mta_tax':0.5,
+                       'tip_amount':tip,
+                       'tolls_amount':tolls,
+                       'improvement_surcharge':0.3,
+                       'total_amount':(fare + extra + 0.5 + tip + tolls + 0.3).round(2)})
+    if 'polygons' in sampler:
+        df['pickup_longitude'], df['pickup_latitude'] = samplePoints(pickupIDs, sampler, rng)
+        df['dropoff_longitude'], df['dropoff_latitude'] = samplePoints(dropoffIDs, sampler, rng)
+    #Trips before 2015 identify their cab and driver, and abbreviate their payment type
+    df['medallion'] = pd.Categorical.from_codes(rng.integers(0, medallionCount, rows), sampler['medallions'])
+    df['hack_license'] = pd.Categorical.from_codes(rng.integers(0, medallionCount, rows), sampler['medallions'])
+    df['surcharge'] = extra
+    return df
+
+#The columns of a header in the order given, from the trips under their normalized names or the fillers.
+def layoutFrame(df, header):
+    names = DataExtraction.normalizeHeader(','.join(header))
+    columns = {}
+    for raw, name in zip(header, names):
+        if name == 'payment_type' and header[0] == 'medallion':
+            columns[raw] = np.where(df['payment_type'] == 1, 'CRD', 'CSH')
+        else:
+            columns[raw] = df[name].values if name in df.columns else fillers[name]
+    return pd.DataFrame(columns, index = df.index)
+
+#Writes rows trips in the layout of the given name to outputFolder, chunkRows at a time.
+#Returns the paths written, the trip_fare file following its trip_data file.
+def generateFile(outputFolder, layoutName, rows, sampler, rng, routeShare = 0.5):
+    layout = layouts[layoutName]
+    parts = [layout] + ([layout['fares']] if 'fares' in layout else [])
+    paths = [os.path.join(outputFolder, part['file']) for part in parts]
+    for written in range(0, rows, chunkRows):
+        df = syntheticTrips(min(chunkRows, rows - written), layout['month'], sampler, rng, routeShare)
+        for part, path in zip(parts, paths):
+            layoutFrame(df, part['header']).to_csv(path, mode = 'w' if written == 0 else 'a', header = written == 0, index = False)
+    return paths
+
+def generateFolder(outputFolder, rows, layoutNames = list(layouts), seed = 0, routeShare = 0.5):
+    os.makedirs(outputFolder, exist_ok = True)
+    needsCoordinates = any('pickup_longitude' in DataExtraction.normalizeHeader(','.join(layouts[name]['header'])) for name in layoutNames)
+    sampler = loadZoneSampler(needsCoordinates)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for name in layoutNames:
+        paths += generateFile(outputFolder, name, rows, sampler, rng, routeShare)
+    return paths
+
+
+#Random trips over the routes of the AAll route set: between Astoria and every Manhattan zone, and between LGA and Astoria,
+#with the LGA/Upper Manhattan trips already shifted into Astoria as findCommuteAirport does.
+def syntheticAAll(rows, month = '2016-01'):
+    zoneLookup = pd.read_csv(taxiZoneLookupPath, index_col = 0, header=0)
+    manhattan = zoneLookup.loc[zoneLookup['Borough'] == 'Manhattan', 'Zone'].tolist()
+    astoria = RouteTable.loadRoutes()['regions']['Astoria']
+    routes = ([(a, m) for a in astoria for m in manhattan] + [(m, a) for a in astoria for m in manhattan]
+              + [(l, a) for a in astoria for l in ['LaGuardia Airport']] + [(a, l) for a in astoria for l in ['LaGuardia Airport']])
+    rng = np.random.default_rng(0)
+    route = rng.integers(0, len(routes), rows)
+    monthStart = pd.Timestamp(month)
+    monthSeconds = int((monthStart + pd.offsets.MonthBegin() - monthStart).total_seconds())
+    return pd.DataFrame({'pickup_datetime':monthStart + pd.to_timedelta(np.sort(rng.integers(0, monthSeconds, rows)), unit = 's'),
+                         'passenger_count':rng.choice(np.array([1,1,1,1,2,2,3,4,5,6], dtype = np.uint8), rows),
+                         'trip_distance':rng.uniform(0.5, 12, rows).round(2).astype(np.float32),
+                         'fare_amount':rng.integers(500, 4500, rows, dtype = np.int32), #In cents
+                         'pickup_neighborhood':pd.Categorical([routes[i][0] for i in route]),
+                         'dropoff_neighborhood':pd.Categorical([routes[i][1] for i in route])})
+
+#Random pickup and dropoff coordinates for trips, scattered around a few hundred spots in Manhattan and Astoria.
+def syntheticCoordinates(df):
+    rng = np.random.default_rng(1)
+    spots = np.column_stack([rng.uniform(-74.02, -73.90, 300), rng.uniform(40.70, 40.80, 300)])
+    for end in ['pickup','dropoff']:
+        spot = spots[rng.integers(0, len(spots), len(df))]
+        df[end + '_longitude'] = spot[:, 0] + rng.normal(0, 0.002, len(df))
+        df[end + '_latitude'] = spot[:, 1] + rng.normal(0, 0.002, len(df))
+    return df
+
+#Random trips between zones, half of them within the regions of our routes, at random latitudes around Upper Manhattan.
+def syntheticZoneTrips(rows):
+    zoneLookup = pd.read_csv(taxiZoneLookupPath, index_col = 0, header=0, keep_default_na=False)
+    regions = RouteTable.loadRoutes()['regions']
+    nearby = zoneLookup.index.values[zoneLookup['Zone'].isin(regions['Astoria'] + regions['Midtown'] + regions['UpperEastSide'] + regions['LGA']).values
+                                     | (zoneLookup['Borough'] == 'Manhattan').values]
+    rng = np.random.default_rng(2)
+    ends = {}
+    for end in ['pickup','dropoff']:
+        ids = np.where(rng.random(rows) < 0.5, rng.choice(nearby, rows), rng.choice(zoneLookup.index.values, rows))
+        ends[end + '_borough'] = pd.Categorical(zoneLookup['Borough'].values[ids - 1])
+        ends[end + '_neighborhood'] = pd.Categorical(zoneLookup['Zone'].values[ids - 1])
+        ends[end + '_latitude'] = rng.uniform(40.70, 40.82, rows)
+    return pd.DataFrame(ends)
+
+if __name__ == '__main__':
+    args = parseArguments()
+    for path in generateFolder(os.path.join(filePath, args.outputFolder), args.rows, args.layouts, args.seed, args.route_share):
+        print('Wrote ' + path)
@@ -0,0 +1,284 @@
+#Cube of taxi trips aggregated by route, week, and interval of the week.
+#Dependencies: numpy, pandas
+#Rather than a sparse MultiIndex frame labelled with intervals, a cube holds the occupied cells of [route, week, bin],
+#where bin is the integer index of the intervalWeekMinutes interval within the week, as one sorted array of their flat
+#indices and a numpy array per aggregated column. Only cells with trips are stored, so a cube grows with the trips it
+#holds rather than with the routes times the weeks they span.
+#Carpool metrics are computed on whole arrays of cells, and the arrays of a saved cube can be memory mapped,
+#so a single route and week to plot it is found by a binary search of the cells rather than loading the cube.
+#Cells are sums, so the cubes of each processed file can be built on their own and merged into those of the whole dataset.
+
+import numpy as np
+import pandas as pd
+import hashlib
+import json
+import os
+import DataAnalysis
+import StageProfiler
+import TripSchema
+
+#The aggregated columns held by a cube, summed over the trips of each cell. Fares are in cents, as in the trips.
+cubeColumns = ['passenger_count','trip_distance','fare_amount','taxi_count']
+cubeDtypes = {'passenger_count':np.int32, 'trip_distance':np.float64, 'fare_amount':np.int64, 'taxi_count':np.int32}
+
+weekMinutes = 7*24*60
+
+#Flat index of a cell, [route, week, bin] of a cube of the given weeks and bins
+def cellIndex(route, week, weekBin, weeks, bins):
+    return (np.asarray(route, dtype = np.int64)*weeks + week)*bins + weekBin
+
+#Route, week and bin of the cells of a cube
+def cellCoordinates(cube):
+    bins = cubeBins(cube)
+    weeks = len(cube['weeks'])
+    cell = np.asarray(cube['cell'])
+    return cell//(weeks*bins), cell//bins % weeks, cell % bins
+
+def cubeBins(cube):
+    return -(-weekMinutes//cube['interval'])
+
+#Sums the values of cells given by their flat index, which may repeat, into a cube's sorted occupied cells.
+def aggregateCells(cube, cell, values):
+    cells, inverse = np.unique(cell, return_inverse = True)
+    cube['cell'] = cells
+    for column in cubeColumns:
+        weights = values[column]
+        if weights is None:
+            sums = np.bincount(inverse, minlength = len(cells))
+        else:
+            sums = np.bincount(inverse, weights = weights.astype(np.float64), minlength = len(cells))
+        cube[column] = sums.astype(cubeDtypes[column])
+    return cube
+
+#The epoch began on a Thursday, three days after the Monday starting its week
+epochMonday = pd.Timestamp('1969-12-29')
+
+#Aggregates trips by route, week and interval of the week into a cube.
+#Weeks run from Monday to Sunday and are labelled by their Sunday, as with pd.Grouper(freq='W').
+#Intervals are closed on the right as with pd.cut, so a trip at midnight Monday falls in no interval, as in transformData.
+#Given a view of DataAnalysis.findRouteSets, only the trips of the view are aggregated, shifted as it says, and only the
+#columns the cube needs are read at the view's positions, so the trips of a route set are never copied as a frame.
+def buildCube(df, interval = None, view = None):
+    interval = DataAnalysis.intervalWeekMinutes if interval is None else interval
+    bins = -(-weekMinutes//interval)
+    rows = slice(None) if view is None else view['rows']
+    viaAstoria = None if view is None else view['via_astoria']
+
+    #Routes are numbered in the order groupby sorts them, from the codes of their pickup and dropoff neighborhoods
+    pickupCodes, pickupCategories = zoneCodes(df['pickup_neighborhood'], rows, viaAstoria)
+    dropoffCodes, dropoffCategories = zoneCodes(df['dropoff_neighborhood'], rows)
+    pair = pickupCodes.astype(np.int64)*len(dropoffCategories) + dropoffCodes
+    hasRoute = (pickupCodes >= 0) & (dropoffCodes >= 0)
+    pairs = np.flatnonzero(np.bincount(pair[hasRoute], minlength = len(pickupCategories)*len(dropoffCategories)))
+    routeOfPair = np.full(len(pickupCategories)*len(dropoffCategories), -1)
+    routeOfPair[pairs] = np.arange(len(pairs))
+    route = np.where(hasRoute, routeOfPair[np.where(hasRoute, pair, 0)], -1)
+    routes = pd.DataFrame({'pickup_neighborhood':pickupCategories[pairs//len(dropoffCategories)],
+                           'dropoff_neighborhood':dropoffCategories[pairs % len(dropoffCategories)]})
+
+    minutes = df['pickup_datetime'].values[rows].astype('datetime64[m]').astype(np.int64) + 3*24*60 #Minutes since epochMonday
+    if view is not None and view['shift_minutes'] is not None:
+        minutes += view['shift_minutes']
+    week = minutes//weekMinutes
+    weekBin = (minutes % weekMinutes - 1)//interval
+    inCube = (weekBin >= 0) & (route >= 0)
+    firstWeek = week[inCube].min() if inCube.any() else 0
+    weeks = int(week[inCube].max() - firstWeek + 1) if inCube.any() else 0
+
+    #Every cell is summed at once by counting on its flat index
+    cell = cellIndex(route[inCube], week[inCube] - firstWeek, weekBin[inCube], weeks, bins)
+    cube = {'routes':routes,
+            'weeks':pd.DatetimeIndex(epochMonday + pd.to_timedelta((firstWeek + np.arange(weeks))*7 + 6, unit = 'D')),
+            'interval':interval}
+    values = {column:None if column == 'taxi_count' else np.nan_to_num(df[column].values[rows][inCube].astype(np.float64))
+              for column in cubeColumns}
+    return aggregateCells(cube, cell, values)
+
+#Category codes of a column of zones at the given positions, along with the categories.
+#Trips marked in viaAstoria are given the code of Astoria, with the categories sorted as if they were strings concatenated
+#to the column, so routes are numbered as groupby numbers those of shifted trips.
+def zoneCodes(zones, rows, viaAstoria = None):
+    zones = zones.astype('category').cat
+    codes = zones.codes.values[rows]
+    if viaAstoria is None:
+        return codes, zones.categories
+    categories = zones.categories.union(pd.Index([DataAnalysis.astoriaNeighborhood])).sort_values()
+    #Missing zones have code -1, which picks the trailing -1
+    recode = np.append(categories.get_indexer(zones.categories), -1)
+    return np.where(viaAstoria, categories.get_loc(DataAnalysis.astoriaNeighborhood), recode[codes]), categories
+
+#The intervals of the week each bin stands for
+def cubeIntervals(cube):
+    return pd.IntervalIndex.from_breaks(np.arange(0, weekMinutes + cube['interval'], cube['interval']))
+
+#Index of a route in the cube, given its pickup and dropoff neighborhoods
+def routeIndex(cube, pickup, dropoff):
+    routes = cube['routes']
+    match = np.flatnonzero((routes['pickup_neighborhood'] == pickup).values & (routes['dropoff_neighborhood'] == dropoff).values)
+    if len(match) == 0:
+        raise KeyError('No trips between ' + pickup + ' and ' + dropoff)
+    return match[0]
+
+#Index of a week in the cube, given the Sunday it is labelled with
+def weekIndex(cube, week):
+    return cube['weeks'].get_loc(pd.Timestamp(week))
+
+#A column of a single route and week, with every bin of the week, found by a binary search of the sorted cells
+def routeWeek(cube, column, route, week):
+    bins = cubeBins(cube)
+    first = cellIndex(route, week, 0, len(cube['weeks']), bins)
+    start, end = np.searchsorted(cube['cell'], [first, first + bins])
+    values = np.zeros(bins, dtype = cubeDtypes[column])
+    values[np.asarray(cube['cell'][start:end]) - first] = cube[column][start:end]
+    return values
+
+#Carpools needed in every cell of the cube
+def cubeCarpools(cube, goal = None):
+    return DataAnalysis.calcCarpools(cube['taxi_count'], cube['passenger_count'], goal)
+
+#The same metadata as DataAnalysis.analyzeMetaData, reduced over the whole cube.
+def analyzeCube(cube, goal = None):
+    total_taxis = int(cube['taxi_count'].sum())
+    total_carpools = int(cubeCarpools(cube, goal).sum())
+    #A route set without any trips reduces nothing, and has no mean passengers per taxi
+    car_reduction_ratio = total_carpools/total_taxis if total_taxis else 0.0
+    miles_reduction = car_reduction_ratio*cube['trip_distance'].sum()
+    meta = pd.Series({'total_taxis':total_taxis,
+                      'total_carpools':total_carpools,
+                      'car_reduction_ratio':car_reduction_ratio,
+                      'miles_reduction':miles_reduction,
+                      'CO2_reduction':(miles_reduction * DataAnalysis.CO2perMile)/907185, #907185 grams per ton
+                      'taxi_mean_passenger':cube['passenger_count'].sum()/total_taxis if total_taxis else np.nan,
+                      'total_fare':TripSchema.toDollars(cube['fare_amount'].sum())}, dtype = object)
+
+    print('Total Taxi Count: ' + str(meta.total_taxis) + '\n' +
+          'Total Carpool Count: ' + str(meta.total_carpools) + '\n' +
+          'Car Reduction Ratio: ' + str('%.2f' % meta.car_reduction_ratio) + '\n' +
+          'Mile Reduction: ' + str('%.2f' % meta.miles_reduction) + '\n' +
+          'CO2 Reduction (Tons): ' + str('%.2f' % meta.CO2_reduction) + '\n' +
+          'Total Fare: ' + str('%.2f' % meta.total_fare) + '\n' +
+          'Mean Passengers Per Taxi: ' + str('%.2f' % meta.taxi_mean_passenger))
+    return meta
+
+#The same metadata for each route of the cube on its own, reduced over weeks and intervals.
+def analyzeRoutes(cube, goal = None):
+    df = cube['routes'].copy()
+    route = cellCoordinates(cube)[0]
+    df['taxi_count'] = np.bincount(route, weights = cube['taxi_count'], minlength = len(df)).astype(np.int64)
+    df['carpool_count'] = np.bincount(route, weights = cubeCarpools(cube, goal), minlength = len(df)).astype(np.int64)
+    df['car_reduction_ratio'] = df['carpool_count']/df['taxi_count']
+    df['miles_reduction'] = df['car_reduction_ratio']*np.bincount(route, weights = cube['trip_distance'], minlength = len(df))
+    df['CO2_reduction'] = (df['miles_reduction'] * DataAnalysis.CO2perMile)/907185 #907185 grams per ton
+    return df
+
+#Sums the cells of a cube into intervals of a multiple of its own interval, as if binned that way in the first place.
+#A trip in (i*interval, (i+1)*interval] is in bin (week_minutes - 1)//interval, i.e. its finer bin divided by the multiple.
+def coarsenCube(cube, interval):
+    if interval % cube['interval'] != 0:
+        raise Exception("ERROR: intervals of " + str(interval) + " minutes can't be made from intervals of " + str(cube['interval']) + " minutes.")
+    factor = interval//cube['interval']
+    coarse = {'routes':cube['routes'], 'weeks':cube['weeks'], 'interval':interval}
+    route, week, weekBin = cellCoordinates(cube)
+    cell = cellIndex(route, week, weekBin//factor, len(cube['weeks']), cubeBins(coarse))
+    return aggregateCells(coarse, cell, {column:np.asarray(cube[column]) for column in cubeColumns})
+
+#Sums cubes of the same interval into one spanning all their routes and weeks.
+#Routes are sorted by neighborhoods, as groupby sorts the routes of concatenated trips.
+def mergeCubes(cubes):
+    interval = cubes[0]['interval']
+    if any(cube['interval'] != interval for cube in cubes):
+        raise Exception("ERROR: only cubes of the same interval can be merged.")
+    routes = pd.concat([cube['routes'].astype(str) for cube in cubes]).drop_duplicates()
+    routes = routes.sort_values(DataAnalysis.routeColumns).reset_index(drop = True)
+    allWeeks = [cube['weeks'] for cube in cubes if len(cube['weeks'])]
+    weeks = pd.date_range(min(w[0] for w in allWeeks), max(w[-1] for w in allWeeks), freq = '7D') if allWeeks else pd.DatetimeIndex([])
+
+    merged = {'routes':routes, 'weeks':weeks, 'interval':interval}
+    routeIndex = pd.MultiIndex.from_frame(routes)
+    cells = []
+    for cube in cubes:
+        if len(cube['weeks']) == 0:
+            continue
+        rows = routeIndex.get_indexer(pd.MultiIndex.from_frame(cube['routes'].astype(str)))
+        route, week, weekBin = cellCoordinates(cube)
+        cells.append(cellIndex(rows[route], week + weeks.get_loc(cube['weeks'][0]), weekBin, len(weeks), cubeBins(cube)))
+    values = {column:np.concatenate([np.asarray(cube[column]) for cube in cubes if len(cube['weeks'])] or [np.zeros(0)])
+              for column in cubeColumns}
+    return aggregateCells(merged, np.concatenate(cells) if cells else np.zeros(0, dtype = np.int64), values)
+
+#What the partial cubes of a processed file depend on: the file itself, the routes and the analysis parameters.
+def partialVersion(path):
+    stat = os.stat(path)
+    with open(DataAnalysis.routesPath, 'rb') as f:
+        routes = hashlib.sha1(f.read()).hexdigest()
+    return {'size':stat.st_size, 'mtime':stat.st_mtime, 'routes':routes, 'interval':DataAnalysis.intervalWeekMinutes,
+            'lga':DataAnalysis.LGAtoAstoria, 'upper':DataAnalysis.UpperManhattanToAstoria}
+
+#Aggregates the trips of a single processed file into a cube per route set, saved in a folder of partialsFolder named
+#after the file, and returns the folder of each. Cubes of the same interval are merged by summing them, see mergeCubes.
+#The cubes are reused as long as partialVersion is unchanged, as recorded in partial.json, which is written last so that
+#the cubes of an interrupted run are built again.
+def buildPartialCubes(path, partialsFolder):
+    name = os.path.splitext(os.path.relpath(path, DataAnalysis.cleanedTripPath))[0].replace(os.sep, '_')
+    folder = os.path.join(partialsFolder, name)
+    versionPath = os.path.join(folder, 'partial.json')
+    version = partialVersion(path)
+    try:
+        with open(versionPath) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = None
+    if stored is not None and stored['version'] == version:
+        return {key:os.path.join(folder, key) for key in stored['sets']}
+    if stored is not None:
+        os.remove(versionPath)
+
+    label = os.path.basename(path)
+    with StageProfiler.stage('read', label) as stage:
+        df = DataAnalysis.readFiles(path = path)
+        stage['rows_out'] = len(df)
+    views = StageProfiler.run('routes', label, DataAnalysis.routeSetViews, df)
+    partials = {}
+    for key, view in views.items():
+        with StageProfiler.stage('cube', label, len(view['rows'])):
+            cube = buildCube(df, view = view)
+        partials[key] = os.path.join(folder, key)
+        saveCube(cube, partials[key])
+    with open(versionPath + '.tmp', 'w') as f:
+        json.dump({'version':version, 'sets':list(partials)}, f, indent = 1)
+    os.replace(versionPath + '.tmp', versionPath)
+    return partials
+
+#The occupied cells of the cube as a frame, in the same layout as DataAnalysis.findCommutes gives.
+def cubeToFrame(cube):
+    route, week, weekBin = cellCoordinates(cube)
+    index = pd.MultiIndex.from_arrays([cube['weeks'][week],
+                                       pd.Categorical.from_codes(weekBin, cubeIntervals(cube))],
+                                      names = ['pickup_datetime','week_minutes'])
+    df = pd.DataFrame({column:np.asarray(cube[column]) for column in cubeColumns}, index = index)
+    df['carpool_count'] = cubeCarpools(cube)
+    for column in DataAnalysis.routeColumns:
+        df[column] = cube['routes'][column].values[route]
+    return df
+
+#Saves a cube as a folder holding an .npy file of its cells and of each column, and the routes, weeks and interval.
+def saveCube(cube, folder):
+    os.makedirs(folder, exist_ok = True)
+    for column in ['cell'] + cubeColumns:
+        np.save(os.path.join(folder, column + '.tmp'), cube[column]) #np.save appends .npy, written aside so a partial file is never loaded
+        os.replace(os.path.join(folder, column + '.tmp.npy'), os.path.join(folder, column + '.npy'))
+    with open(os.path.join(folder, 'cube.json'), 'w') as f:
+        json.dump({'routes':cube['routes'].astype(str).values.tolist(),
+                   'weeks':[str(week.date()) for week in cube['weeks']],
+                   'interval':cube['interval']}, f, indent = 1)
+
+#Loads a saved cube, its columns memory mapped unless mmap_mode is None.
+def loadCube(folder, mmap_mode = 'r'):
+    with open(os.path.join(folder, 'cube.json')) as f:
+        meta = json.load(f)
+    cube = {'routes':pd.DataFrame(meta['routes'], columns = DataAnalysis.routeColumns),
+            'weeks':pd.DatetimeIndex(meta['weeks']),
+            'interval':meta['interval']}
+    for column in ['cell'] + cubeColumns:
+        cube[column] = np.load(os.path.join(folder, column + '.npy'), mmap_mode = mmap_mode)
+    return cube
@@ -0,0 +1,62 @@
+#Compact column types of the processed trips, shared by the extraction output and DataAnalysis.readFiles.
+#Dependencies: numpy, pandas
+#Datetimes are parsed once on ingestion, zones are categorical, coordinates float32 (missing since July 2016),
+#passenger counts uint8 and fares int32 cents, so a year of filtered trips takes a fraction of the memory
+#of Python strings and float64 columns.
+
+import numpy as np
+import pandas as pd
+
+#Fares are stored in whole cents
+fareColumns = ['fare_amount','extra','mta_tax','tip_amount','tolls_amount','improvement_surcharge','total_amount']
+centsPerDollar = 100
+
+coordinateColumns = ['pickup_longitude','pickup_latitude','dropoff_longitude','dropoff_latitude']
+zoneColumns = ['pickup_borough','pickup_neighborhood','dropoff_borough','dropoff_neighborhood']
+datetimeColumns = ['pickup_datetime','dropoff_datetime']
+
+#Every era of nyc.gov's files writes its datetimes in this format
+datetimeFormat = '%Y-%m-%d %H:%M:%S'
+
+#Types the raw .csv columns are parsed as, under the names normalizeHeader gives them.
+#Counts and LocationIDs are parsed as floats so that blank values are read, they are made integers by compactTrips.
+#Coordinates are kept at full precision until they have been geocoded.
+csvDtypes = dict({'pickup_datetime':str, 'dropoff_datetime':str, 'medallion':str, 'hack_license':str,
+                  'passenger_count':np.float32, 'trip_distance':np.float32, 'trip_time_in_secs':np.float32,
+                  'PULocationID':np.float32, 'DOLocationID':np.float32, 'payment_type':np.float32, 'surcharge':np.float64},
+                 **{column:np.float64 for column in coordinateColumns + fareColumns})
+
+#Types of the processed trips' columns. Missing counts and fares are 0.
+tripDtypes = dict({'pickup_datetime':'datetime64[s]', 'dropoff_datetime':'datetime64[s]',
+                   'passenger_count':np.uint8, 'trip_distance':np.float32, 'trip_time_in_secs':np.float32, 'payment_type':np.uint8},
+                  **{column:np.float32 for column in coordinateColumns},
+                  **{column:np.int32 for column in fareColumns},
+                  **{column:'category' for column in zoneColumns})
+
+#Casts the columns of a frame of trips to their compact types, leaving other columns as they are.
+#Fares still in dollars, as floats, are converted to cents, and datetimes still strings are parsed.
+def compactTrips(df):
+    types = {}
+    for column in df.columns:
+        dtype = tripDtypes.get(column)
+        if dtype is None or df[column].dtype == dtype:
+            continue
+        if column in datetimeColumns and df[column].dtype.kind != 'M':
+            df[column] = parseDatetimes(df[column])
+        if column in fareColumns and df[column].dtype.kind == 'f':
+            df[column] = (df[column].fillna(0)*centsPerDollar).round()
+        if dtype != 'category' and np.dtype(dtype).kind in 'iu':
+            info = np.iinfo(dtype)
+            df[column] = df[column].fillna(0).clip(info.min, info.max)
+        types[column] = dtype
+    return df.astype(types) if types else df
+
+#Parses datetime strings in the format of nyc.gov's files. Malformed ones are NaT.
+#With the format given, pandas parses every string directly, which is several times faster than caching the
+#distinct strings, as most pickup seconds of a month are distinct anyway.
+def parseDatetimes(strings):
+    return pd.to_datetime(strings, format = datetimeFormat, errors = 'coerce', cache = False).astype('datetime64[s]')
+
+#Dollars of an amount or sum in cents
+def toDollars(cents):
+    return cents/centsPerDollar
@@ -0,0 +1,318 @@
+#Batch reverse geocoding of pickup/dropoff lat/lon onto the nyc.gov taxi zones.
+#Dependencies: shapely (>= 2.0), numpy, pandas, nyc.gov shapefiles and zone lookup .csv, GDAL/OGR to compile the zones
+#Instead of filtering the OGR layer once per point, the zone polygons are read once, projected to WGS84,
+#and indexed with a grid over their bounding boxes so that a whole chunk of coordinates is resolved at once.
+#The projected polygons, their index and the zone lookup are compiled once into a folder of .npy files next to the
+#shapefile, which every later run memory maps without opening the shapefile, so GDAL is only needed the first time.
+
+import numpy as np
+import pandas as pd
+import shapely
+import hashlib
+import os
+import shutil
+import sys
+
+#Outermost bounds of NYC, points outside of these are never looked up
+NYCN = 40.92
+NYCS = 40.49
+NYCW = -74.26
+NYCE = -73.69
+
+#LocationID reserved for points that are not inside any taxi zone
+UnknownLocationID = 0
+
+#Number of grid cells per side of the bounding box index over NYC
+ZoneGridSize = 64
+
+#Version of the compiled zones' layout, to be bumped whenever compileZones writes them differently
+ZoneArtifactVersion = 1
+
+#Arrays the compiled zones are made of, each saved as its own .npy file
+ZoneArtifactArrays = ['wkb','wkbOffsets','locationIDs','bounds','zoneCells','zoneCellOffsets',
+                      'boroughCodes','boroughCategories','neighborhoodCodes','neighborhoodCategories']
+
+#Cell size in degrees of the precomputed lat/lon -> LocationID raster (roughly 20 meters)
+ZoneRasterResolution = 0.0002
+
+#Raster value for cells crossed by a zone border, which need an exact polygon test
+BoundaryCell = np.iinfo(np.uint16).max
+
+#Reads the zone lookup table into categorical borough/neighborhood codes indexed directly by LocationID.
+#This is all that is needed to name zones of post July 2016 data, which already comes with LocationIDs.
+def loadZoneLookup(taxiZoneLookupPath):
+    #The lookup has a zone literally named 'NA', which pandas would otherwise read as missing
+    zoneLookup = pd.read_csv(taxiZoneLookupPath, index_col = 0, header=0, keep_default_na=False)
+    return buildZoneLookup(zoneLookup)
+
+def buildZoneLookup(zoneLookup):
+    size = int(zoneLookup.index.max()) + 1
+    lookup = {}
+    for column, name in [('Borough','borough'), ('Zone','neighborhood')]:
+        #Index 0, and any LocationID missing from the lookup, is our unknown location 'NA'
+        categories = pd.Index(pd.unique(np.concatenate([['NA'], zoneLookup[column].values.astype(object)])))
+        codes = np.zeros(size, dtype=np.int16)
+        codes[zoneLookup.index.values] = categories.get_indexer(zoneLookup[column].values)
+        lookup[name + 'Categories'] = categories
+        lookup[name + 'Codes'] = codes
+    return lookup
+
+#Reads the taxi zone polygons and the zone lookup table into a dictionary used by the batch geocoder.
+def loadZones(taxiShapefilePath, taxiZoneLookupPath):
+    zones = loadCompiledZones(taxiShapefilePath, taxiZoneLookupPath)
+    zones['raster'] = loadZoneRaster(taxiShapefilePath, zones)
+    return zones
+
+#Reads the taxi zone polygons of the shapefile in WGS84, along with their LocationIDs.
+def readZonePolygons(taxiShapefilePath):
+    try:
+        import ogr
+    except ImportError:
+        raise Exception("ERROR: GDAL/OGR is needed to compile the taxi zones of " + taxiShapefilePath + 
+                        ", or copy its compiled zones over from a machine where it is installed.")
+    ds_in = ogr.Open(taxiShapefilePath) #Get the contents of the shape file
+    lyr_in = ds_in.GetLayer(0)    #Get the shape file's first layer
+    idx_reg = lyr_in.GetLayerDefn().GetFieldIndex("LocationID")
+    #We transform the zones from the shapefile's projection to WGS84 (EPSG:4326) once,
+    #rather than transforming every single trip coordinate into the shapefile's projection.
+    geo_ref = lyr_in.GetSpatialRef()
+    point_ref = ogr.osr.SpatialReference()
+    point_ref.ImportFromEPSG(4326)
+    if hasattr(point_ref, 'SetAxisMappingStrategy'): #GDAL 3 defaults EPSG:4326 to lat/lon axis order
+        point_ref.SetAxisMappingStrategy(ogr.osr.OAMS_TRADITIONAL_GIS_ORDER)
+    ctran = ogr.osr.CoordinateTransformation(geo_ref, point_ref)
+
+    polygons = []
+    locationIDs = []
+    for feat_in in lyr_in:
+        geom = feat_in.GetGeometryRef().Clone()
+        geom.Transform(ctran)
+        polygons.append(shapely.from_wkb(bytes(geom.ExportToWkb())))
+        locationIDs.append(int(feat_in.GetFieldAsString(idx_reg)))
+    ds_in = None
+    return np.array(polygons, dtype=object), np.array(locationIDs, dtype=np.uint16)
+
+#Builds the spatial index over WGS84 zone polygons, alongside the zone lookup.
+def buildZones(polygons, locationIDs, lookup):
+    shapely.prepare(polygons)
+
+    #Every zone is registered in each grid cell its bounding box overlaps
+    bounds = shapely.bounds(polygons)
+    cellX = ((bounds[:,[0,2]] - NYCW)/(NYCE - NYCW)*ZoneGridSize).astype(int).clip(0, ZoneGridSize - 1)
+    cellY = ((bounds[:,[1,3]] - NYCS)/(NYCN - NYCS)*ZoneGridSize).astype(int).clip(0, ZoneGridSize - 1)
+    zoneCells = [(np.arange(cellY[i,0], cellY[i,1] + 1)[:,None]*ZoneGridSize 
+                  + np.arange(cellX[i,0], cellX[i,1] + 1)[None,:]).ravel() for i in range(len(polygons))]
+
+    zones = dict(lookup)
+    zones.update({'polygons':polygons,
+                  'locationIDs':locationIDs,
+                  'bounds':bounds,
+                  'zoneCells':zoneCells})
+    return zones
+
+#Hash of the shapefile, the zone lookup and the grid settings, used to version the compiled zones.
+def zoneArtifactPath(taxiShapefilePath, taxiZoneLookupPath):
+    sha = hashlib.sha1(shapefileHash(taxiShapefilePath).encode())
+    with open(taxiZoneLookupPath, 'rb') as f:
+        sha.update(f.read())
+    sha.update(str((ZoneArtifactVersion, ZoneGridSize, NYCN, NYCS, NYCW, NYCE)).encode())
+    return os.path.splitext(taxiShapefilePath)[0] + '_compiled_' + sha.hexdigest()[:12]
+
+#Memory maps the compiled zones for this version of the shapefile and zone lookup, compiling them first if need be.
+#Only the polygons are rebuilt from their WKB, every other array is used straight from the files.
+def loadCompiledZones(taxiShapefilePath, taxiZoneLookupPath):
+    path = zoneArtifactPath(taxiShapefilePath, taxiZoneLookupPath)
+    if not os.path.exists(path):
+        print('Compiling zones ' + path + '...')
+        compileZones(taxiShapefilePath, taxiZoneLookupPath, path)
+    arrays = {name:np.load(os.path.join(path, name + '.npy'), mmap_mode='r') for name in ZoneArtifactArrays}
+
+    wkb = arrays['wkb']
+    wkbOffsets = arrays['wkbOffsets']
+    polygons = shapely.from_wkb([wkb[wkbOffsets[i]:wkbOffsets[i + 1]].tobytes() for i in range(len(wkbOffsets) - 1)])
+    shapely.prepare(polygons)
+    return {'boroughCategories':pd.Index(arrays['boroughCategories'].astype(object)),
+            'boroughCodes':arrays['boroughCodes'],
+            'neighborhoodCategories':pd.Index(arrays['neighborhoodCategories'].astype(object)),
+            'neighborhoodCodes':arrays['neighborhoodCodes'],
+            'polygons':polygons,
+            'locationIDs':arrays['locationIDs'],
+            'bounds':arrays['bounds'],
+            'zoneCells':np.split(arrays['zoneCells'], arrays['zoneCellOffsets'][1:-1])}
+
+#Reads the shapefile and the zone lookup, builds the zones and saves their arrays to the folder at path.
+#Polygons are saved as their concatenated WKB, and each zone's grid cells concatenated, with the offsets of each zone.
+def compileZones(taxiShapefilePath, taxiZoneLookupPath, path):
+    polygons, locationIDs = readZonePolygons(taxiShapefilePath)
+    zones = buildZones(polygons, locationIDs, loadZoneLookup(taxiZoneLookupPath))
+    wkb = shapely.to_wkb(zones['polygons'])
+    arrays = {'wkb':np.frombuffer(b''.join(wkb), dtype=np.uint8),
+              'wkbOffsets':np.cumsum([0] + [len(polygon) for polygon in wkb]),
+              'locationIDs':zones['locationIDs'],
+              'bounds':zones['bounds'],
+              'zoneCells':np.concatenate(zones['zoneCells']).astype(np.int32),
+              'zoneCellOffsets':np.cumsum([0] + [len(cells) for cells in zones['zoneCells']]),
+              'boroughCodes':zones['boroughCodes'],
+              'boroughCategories':np.array(zones['boroughCategories'].tolist(), dtype=str),
+              'neighborhoodCodes':zones['neighborhoodCodes'],
+              'neighborhoodCategories':np.array(zones['neighborhoodCategories'].tolist(), dtype=str)}
+
+    #Written aside and renamed, so a partially written folder is never loaded
+    temporaryPath = path + '.tmp' + str(os.getpid())
+    os.makedirs(temporaryPath)
+    for name in ZoneArtifactArrays:
+        np.save(os.path.join(temporaryPath, name + '.npy'), arrays[name])
+    try:
+        os.rename(temporaryPath, path)
+    except OSError:
+        #Another process compiled them first
+        shutil.rmtree(temporaryPath)
+        if not os.path.exists(path):
+            raise
+
+#Given arrays of longitude and latitude, returns an array of the LocationIDs containing each point.
+#Points outside of NYC, missing, or not within any zone are given UnknownLocationID.
+#Points landing in the interior of a zone are read straight from the raster, only those near a border are tested exactly.
+#Those are few, and the vectorized polygon test resolves them about as fast as a warm cache of earlier results would.
+def locateZones(lon, lat, zones):
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    raster = zones.get('raster')
+
+    found = np.full(len(lon), UnknownLocationID, dtype=np.uint16)
+    inBounds = np.flatnonzero((lon >= NYCW) & (lon <= NYCE) & (lat >= NYCS) & (lat <= NYCN))
+    if raster is None:
+        unresolved = inBounds
+    else:
+        row = np.minimum(((lat[inBounds] - NYCS)/ZoneRasterResolution).astype(int), raster.shape[0] - 1)
+        col = np.minimum(((lon[inBounds] - NYCW)/ZoneRasterResolution).astype(int), raster.shape[1] - 1)
+        found[inBounds] = raster[row, col]
+        unresolved = np.flatnonzero(found == BoundaryCell)
+
+    found[unresolved] = locateZonesExact(lon[unresolved], lat[unresolved], zones)
+    return found
+
+#Point in polygon test of every coordinate against the zones' bounding box grid.
+def locateZonesExact(lon, lat, zones):
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    found = np.full(len(lon), UnknownLocationID, dtype=np.uint16)
+
+    inBounds = np.flatnonzero((lon >= NYCW) & (lon <= NYCE) & (lat >= NYCS) & (lat <= NYCN))
+    if len(inBounds) == 0:
+        return found
+
+    #Sort the points by grid cell, so each cell's points are a contiguous slice
+    cellX = np.minimum(((lon[inBounds] - NYCW)/(NYCE - NYCW)*ZoneGridSize).astype(int), ZoneGridSize - 1)
+    cellY = np.minimum(((lat[inBounds] - NYCS)/(NYCN - NYCS)*ZoneGridSize).astype(int), ZoneGridSize - 1)
+    cells = cellY*ZoneGridSize + cellX
+    order = np.argsort(cells, kind='stable')
+    sortedPoints = inBounds[order]
+    sortedCells = cells[order]
+    allCells = np.arange(ZoneGridSize*ZoneGridSize)
+    cellStart = np.searchsorted(sortedCells, allCells, side='left')
+    cellEnd = np.searchsorted(sortedCells, allCells, side='right')
+
+    #Zones are tested in shapefile order and a point keeps the first zone it falls in,
+    #matching the first feature the OGR spatial filter used to return.
+    bounds = zones['bounds']
+    for i, polygon in enumerate(zones['polygons']):
+        zoneCells = zones['zoneCells'][i]
+        zoneCells = zoneCells[cellEnd[zoneCells] > cellStart[zoneCells]]
+        if len(zoneCells) == 0:
+            continue
+        candidates = np.concatenate([sortedPoints[cellStart[c]:cellEnd[c]] for c in zoneCells])
+        candidates = candidates[found[candidates] == UnknownLocationID]
+        x = lon[candidates]
+        y = lat[candidates]
+        inBox = (x >= bounds[i,0]) & (x <= bounds[i,2]) & (y >= bounds[i,1]) & (y <= bounds[i,3])
+        candidates = candidates[inBox]
+        hits = shapely.intersects_xy(polygon, lon[candidates], lat[candidates])
+        found[candidates[hits]] = zones['locationIDs'][i]
+    return found
+
+#Given an array of LocationIDs as read from a file, returns them as integers, missing or unknown ones as UnknownLocationID.
+def cleanLocationIDs(locationIDs, zones):
+    locationIDs = pd.to_numeric(pd.Series(locationIDs), errors='coerce').fillna(UnknownLocationID).values.astype(np.intp)
+    locationIDs[(locationIDs < 0) | (locationIDs >= len(zones['boroughCodes']))] = UnknownLocationID
+    return locationIDs
+
+#Given an array of LocationIDs, returns the corresponding categorical borough and neighborhood names in one take.
+#Missing or unknown LocationIDs are named 'NA'.
+def zoneNames(locationIDs, zones):
+    locationIDs = cleanLocationIDs(locationIDs, zones)
+    boroughs = pd.Categorical.from_codes(zones['boroughCodes'][locationIDs], zones['boroughCategories'])
+    neighborhoods = pd.Categorical.from_codes(zones['neighborhoodCodes'][locationIDs], zones['neighborhoodCategories'])
+    return (boroughs, neighborhoods)
+
+#Reverse geocodes the pickups and dropoffs of an entire dataframe of trips at once.
+def geocodeTrips(df, zones):
+    pickupIDs = locateZones(df['pickup_longitude'].values, df['pickup_latitude'].values, zones)
+    dropoffIDs = locateZones(df['dropoff_longitude'].values, df['dropoff_latitude'].values, zones)
+
+    df['pickup_borough'], df['pickup_neighborhood'] = zoneNames(pickupIDs, zones)
+    df['dropoff_borough'], df['dropoff_neighborhood'] = zoneNames(dropoffIDs, zones)
+    return df
+
+#Hash of the shapefile contents and raster settings, used to version the precomputed raster.
+def shapefileHash(taxiShapefilePath):
+    sha = hashlib.sha1()
+    for extension in ['.shp','.dbf','.prj']:
+        with open(os.path.splitext(taxiShapefilePath)[0] + extension, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+def zoneRasterPath(taxiShapefilePath):
+    version = shapefileHash(taxiShapefilePath)[:12] + '_' + str(ZoneRasterResolution)
+    return os.path.splitext(taxiShapefilePath)[0] + '_raster_' + version + '.npy'
+
+#Memory maps the lat/lon -> LocationID raster for this version of the shapefile, building it first if need be.
+def loadZoneRaster(taxiShapefilePath, zones):
+    path = zoneRasterPath(taxiShapefilePath)
+    if not os.path.exists(path):
+        print('Building zone raster ' + path + '...')
+        raster = buildZoneRaster(zones)
+        #np.save appends .npy, written aside under this process' own name so a partial file is never loaded
+        temporaryPath = path + '.tmp' + str(os.getpid())
+        np.save(temporaryPath, raster)
+        os.replace(temporaryPath + '.npy', path)
+    return np.load(path, mmap_mode='r')
+
+#Rasterizes the zones onto a ZoneRasterResolution lat/lon grid over the NYC bounding box.
+#Each cell holds the LocationID covering the whole cell, UnknownLocationID if no zone touches it,
+#or BoundaryCell if a zone border passes through it.
+def buildZoneRaster(zones):
+    rows = int(np.ceil((NYCN - NYCS)/ZoneRasterResolution))
+    cols = int(np.ceil((NYCE - NYCW)/ZoneRasterResolution))
+
+    #Classify every cell by its center, then overwrite the cells crossed by borders
+    centerLat = NYCS + (np.arange(rows) + 0.5)*ZoneRasterResolution
+    centerLon = NYCW + (np.arange(cols) + 0.5)*ZoneRasterResolution
+    raster = np.empty((rows, cols), dtype=np.uint16)
+    for row in range(rows):
+        raster[row] = locateZonesExact(centerLon, np.full(cols, centerLat[row]), zones)
+
+    #Borders are densified to half a cell, so every cell they cross holds at least one vertex or neighbors one that does.
+    borders = shapely.segmentize(shapely.boundary(zones['polygons']), ZoneRasterResolution/2)
+    vertices = shapely.get_coordinates(borders)
+    row = np.floor((vertices[:,1] - NYCS)/ZoneRasterResolution).astype(int)
+    col = np.floor((vertices[:,0] - NYCW)/ZoneRasterResolution).astype(int)
+    for rowOffset in [-1, 0, 1]:
+        for colOffset in [-1, 0, 1]:
+            r = row + rowOffset
+            c = col + colOffset
+            inside = (r >= 0) & (r < rows) & (c >= 0) & (c < cols)
+            raster[r[inside], c[inside]] = BoundaryCell
+    return raster
+
+#Compile the zones and precompute the zone raster once, so the extraction scripts only have to memory map them.
+if __name__ == '__main__':
+    filePath = os.path.dirname(os.path.realpath(__file__))
+    taxiShapefilePath = filePath + '/geographicData/taxi_zones/taxi_zones.shp'
+    taxiZoneLookupPath = filePath + '/geographicData/taxi_zone_lookup.csv'
+    if len(sys.argv) > 1:
+        taxiShapefilePath = sys.argv[1]
+
+    zones = loadZones(taxiShapefilePath, taxiZoneLookupPath)
+    print('Compiled zones at ' + zoneArtifactPath(taxiShapefilePath, taxiZoneLookupPath))
+    print('Zone raster of shape ' + str(zones['raster'].shape) + ' at ' + zoneRasterPath(taxiShapefilePath))
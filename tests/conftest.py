@@ -0,0 +1,20 @@
+#The scripts are modules at the root of the repository, not an installed package
+import importlib.util
+import os
+import sys
+import pytest
+
+filePath = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, filePath)
+
+import ZoneGeocoder
+
+taxiShapefilePath = filePath + '/geographicData/taxi_zones/taxi_zones.shp'
+taxiZoneLookupPath = filePath + '/geographicData/taxi_zone_lookup.csv'
+
+#The compiled zones and their raster, skipping the test when they are not compiled and GDAL/OGR isn't there to compile them
+@pytest.fixture(scope = 'session')
+def zones():
+    if not os.path.exists(ZoneGeocoder.zoneArtifactPath(taxiShapefilePath, taxiZoneLookupPath)) and importlib.util.find_spec('ogr') is None:
+        pytest.skip('the taxi zones are not compiled and GDAL/OGR is not installed')
+    return ZoneGeocoder.loadZones(taxiShapefilePath, taxiZoneLookupPath)
@@ -0,0 +1,27 @@
+#Extraction of zipped raw files, sequentially and over worker processes.
+import glob
+import os
+import zipfile
+import pandas as pd
+import DataExtraction
+import SyntheticTrips
+
+def extractedRows(outputFolder):
+    return sum(len(pd.read_parquet(path)) for path in glob.glob(os.path.join(outputFolder, '**', '*.parquet'), recursive = True))
+
+#A .csv.zip matches both the '*.zip' and '*.csv' patterns, and must still be extracted once
+def test_zipped_file_extracted_once(tmp_path):
+    raw = tmp_path / 'raw'
+    csvPath = SyntheticTrips.generateFolder(str(raw), 5000, ['GreenPostJuly2016'])[0]
+    with zipfile.ZipFile(csvPath + '.zip', 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.write(csvPath, os.path.basename(csvPath))
+    os.remove(csvPath)
+
+    files = DataExtraction.findFiles(str(raw), True, str(tmp_path / 'listed'))[0]
+    assert files == [csvPath + '.zip']
+
+    DataExtraction.cleanData(str(raw), outputFolder = str(tmp_path / 'sequential'))
+    DataExtraction.cleanData(str(raw), workers = 2, outputFolder = str(tmp_path / 'workers'))
+    rows = extractedRows(str(tmp_path / 'sequential'))
+    assert rows > 0
+    assert extractedRows(str(tmp_path / 'workers')) == rows
@@ -0,0 +1,26 @@
+#The sparse cells of a TripCube against the intervals findCommutes gives.
+import pandas as pd
+import DataAnalysis
+import SyntheticTrips
+import TripCube
+
+def comparable(result):
+    result = result.drop('week_minutes', axis = 1, errors = 'ignore').reset_index()
+    return result.astype({'week_minutes':str, 'pickup_neighborhood':str, 'dropoff_neighborhood':str})
+
+def test_cube_matches_commutes():
+    df = SyntheticTrips.syntheticAAll(400)
+    commutes = DataAnalysis.analyzeMetaData(DataAnalysis.findCommutes(df))
+    cube = TripCube.buildCube(df)
+    cells = comparable(TripCube.cubeToFrame(cube))
+    assert len(cells) == len(cube['cell'])
+    pd.testing.assert_frame_equal(cells, comparable(commutes)[cells.columns], check_dtype = False)
+
+    metadata = TripCube.analyzeCube(cube)
+    assert metadata.total_taxis == commutes.total_taxis
+    assert metadata.total_carpools == commutes.total_carpools
+
+def test_empty_cube_metadata():
+    metadata = TripCube.analyzeCube(TripCube.buildCube(SyntheticTrips.syntheticAAll(400).iloc[:0]))
+    assert metadata.total_taxis == 0 and metadata.car_reduction_ratio == 0 and metadata.miles_reduction == 0
+    assert pd.isna(metadata.taxi_mean_passenger)
@@ -0,0 +1,49 @@
+#The keyed lockstep join of trips before 2015 to their fares against the positional join it replaced, and against
+#fares listed in another order than their trips, or missing, which only the keyed join handles.
+import numpy as np
+import pandas as pd
+import pytest
+import Baselines
+import DataExtraction
+import RouteTable
+import SyntheticTrips
+
+#Small enough that trips and fares out of order are kept pending across many chunks
+chunksize = 137
+
+@pytest.fixture
+def tripFile(tmp_path):
+    sampler = SyntheticTrips.loadZoneSampler()
+    return SyntheticTrips.generateFile(str(tmp_path), 'Pre2015', 1000, sampler, np.random.default_rng(0), routeShare = 0.8)[0]
+
+@pytest.fixture
+def routedZones(zones):
+    return dict(zones, routes = RouteTable.loadRoutes())
+
+def test_keyed_fares_match_positional(tripFile, routedZones):
+    positional = Baselines.readDataPositional(tripFile, routedZones, chunksize)
+    keyed = DataExtraction.readData(tripFile, None, routedZones, chunksize)
+    assert len(keyed) > 0
+    pd.testing.assert_frame_equal(keyed.reset_index(drop = True), positional.reset_index(drop = True))
+
+#Row orders of the trip_fare file, given its number of rows
+fareOrders = {'shuffled':lambda rows: np.random.default_rng(1).permutation(rows),
+              'rotated':lambda rows: np.roll(np.arange(rows), 300),
+              'swapped':lambda rows: np.concatenate([np.arange(500, rows), np.arange(500)]),
+              'dropped':lambda rows: np.sort(np.random.default_rng(2).choice(rows, rows - 100, replace = False)),
+              'shuffled and dropped':lambda rows: np.random.default_rng(3).choice(rows, rows - 100, replace = False)}
+
+@pytest.mark.parametrize('order', list(fareOrders))
+def test_keyed_fares_out_of_order(tripFile, routedZones, order):
+    aligned = DataExtraction.readData(tripFile, None, routedZones, chunksize)
+
+    fareFile = DataExtraction.fareFile(tripFile)
+    fares = pd.read_csv(fareFile, dtype = str, keep_default_na = False)
+    rows = fareOrders[order](len(fares))
+    fares.iloc[rows].to_csv(fareFile, index = False)
+    keyed = DataExtraction.readData(tripFile, None, routedZones, chunksize)
+
+    #Both files list the same trips, so the trips are indexed by their row in either file, and those without a fare are dropped
+    expected = aligned[aligned.index.isin(rows)]
+    assert len(expected) < len(aligned) if len(rows) < len(fares) else len(expected) == len(aligned)
+    pd.testing.assert_frame_equal(keyed.sort_index(), expected.sort_index())
@@ -0,0 +1,28 @@
+#The raster lookup of locateZones against the exact polygon test, where they are most likely to disagree.
+import numpy as np
+import shapely
+import ZoneGeocoder
+
+#Points along every zone border, nudged a few meters either way, and points on the borders themselves
+def borderPoints(zones, count = 200000):
+    vertices = shapely.get_coordinates(shapely.segmentize(shapely.boundary(zones['polygons']), ZoneGeocoder.ZoneRasterResolution))
+    rng = np.random.default_rng(0)
+    vertices = vertices[rng.integers(0, len(vertices), count)]
+    nudged = vertices + rng.uniform(-5e-5, 5e-5, vertices.shape)
+    points = np.concatenate([vertices[:count//10], nudged])
+    return points[:,0], points[:,1]
+
+def test_raster_matches_exact_along_borders(zones):
+    lon, lat = borderPoints(zones)
+    exact = ZoneGeocoder.locateZonesExact(lon, lat, zones)
+    assert len(np.unique(exact)) > 100
+    np.testing.assert_array_equal(ZoneGeocoder.locateZones(lon, lat, zones), exact)
+    #Without the raster every point takes the exact test
+    np.testing.assert_array_equal(ZoneGeocoder.locateZones(lon, lat, dict(zones, raster = None)), exact)
+
+def test_missing_and_outside_points_are_unknown(zones):
+    lon = np.array([np.nan, -73.95, np.nan, -75.0, -73.0, -73.95, 0.0, -73.95])
+    lat = np.array([40.75, np.nan, np.nan, 40.75, 40.75, 41.5, 0.0, 40.0])
+    found = ZoneGeocoder.locateZones(lon, lat, zones)
+    np.testing.assert_array_equal(found, np.full(len(lon), ZoneGeocoder.UnknownLocationID))
+    np.testing.assert_array_equal(ZoneGeocoder.locateZonesExact(lon, lat, zones), found)
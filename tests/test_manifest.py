@@ -0,0 +1,92 @@
+#Incremental extraction: which raw files the manifest skips, and which it extracts again.
+import json
+import os
+import pandas as pd
+import DataExtraction
+import SyntheticTrips
+
+#The files of rawFolder the manifest of outputFolder has yet to extract
+def pending(rawFolder, outputFolder, force = False):
+    return [os.path.basename(path) for path in DataExtraction.findFiles(rawFolder, force, outputFolder)[0]]
+
+def manifestFiles(outputFolder):
+    with open(outputFolder + '_manifest.json') as f:
+        return json.load(f)['files']
+
+def test_unchanged_and_touched_files_are_skipped(tmp_path):
+    raw, out = str(tmp_path / 'raw'), str(tmp_path / 'out')
+    csvPath = SyntheticTrips.generateFolder(raw, 500, ['GreenPostJuly2016'])[0]
+    assert pending(raw, out) == ['green_tripdata_2016-07.csv']
+    DataExtraction.cleanData(raw, outputFolder = out)
+    assert pending(raw, out) == []
+
+    #Only the modification time changed, the file is hashed and still skipped
+    os.utime(csvPath, (0, 12345))
+    assert pending(raw, out) == []
+    assert manifestFiles(out)['green_tripdata_2016-07.csv']['mtime'] == 12345
+
+    #A changed file is extracted again
+    with open(csvPath, 'a') as f:
+        f.write('\n')
+    assert pending(raw, out) == ['green_tripdata_2016-07.csv']
+
+def test_force_keeps_other_folders(tmp_path):
+    out = str(tmp_path / 'out')
+    green, yellow = str(tmp_path / 'green'), str(tmp_path / 'yellow')
+    SyntheticTrips.generateFolder(green, 500, ['GreenPostJuly2016'])
+    SyntheticTrips.generateFolder(yellow, 500, ['YellowPostJuly2016'])
+    DataExtraction.cleanData(green, outputFolder = out)
+    DataExtraction.cleanData(yellow, outputFolder = out)
+
+    DataExtraction.cleanData(yellow, force = True, outputFolder = out)
+    assert set(manifestFiles(out)) == {'green_tripdata_2016-07.csv', 'yellow_tripdata_2016-07.csv'}
+    assert pending(green, out) == []
+    assert pending(yellow, out) == []
+
+def test_zone_version_change_rebuilds_current_folder(tmp_path, monkeypatch, capsys):
+    out = str(tmp_path / 'out')
+    green, yellow = str(tmp_path / 'green'), str(tmp_path / 'yellow')
+    SyntheticTrips.generateFolder(green, 500, ['GreenPostJuly2016'])
+    SyntheticTrips.generateFolder(yellow, 500, ['YellowPostJuly2016'])
+    DataExtraction.cleanData(green, outputFolder = out)
+    DataExtraction.cleanData(yellow, outputFolder = out)
+    rows = len(pd.read_parquet(out))
+
+    zoneVersions = DataExtraction.zoneVersions
+    monkeypatch.setattr(DataExtraction, 'zoneVersions', lambda *args: dict(zoneVersions(*args), routes = 'changed'))
+    capsys.readouterr()
+    assert pending(yellow, out) == ['yellow_tripdata_2016-07.csv']
+    assert green in capsys.readouterr().out
+
+    #Only the folder extracted again is rebuilt, the trips of the other one are kept
+    DataExtraction.cleanData(yellow, outputFolder = out)
+    assert pending(yellow, out) == []
+    assert pending(green, out) == ['green_tripdata_2016-07.csv']
+    assert len(pd.read_parquet(out)) == rows
+
+def test_changed_fares_extract_trips_again(tmp_path, zones):
+    raw, out = str(tmp_path / 'raw'), str(tmp_path / 'out')
+    tripFile, fareFile = SyntheticTrips.generateFolder(raw, 500, ['Pre2015'], routeShare = 1)
+    DataExtraction.cleanData(raw, outputFolder = out)
+    assert pending(raw, out) == []
+    assert 'trip_fare_1.csv' in manifestFiles(out)
+
+    fares = pd.read_csv(fareFile)
+    fares[' fare_amount'] += 1
+    fares.to_csv(fareFile, index = False)
+    assert pending(raw, out) == ['trip_data_1.csv']
+    before = pd.read_parquet(out)['fare_amount'].sum()
+    DataExtraction.cleanData(raw, outputFolder = out)
+    after = pd.read_parquet(out)
+    assert after['fare_amount'].sum() == before + 100*len(after)
+
+def test_unknown_layouts_are_skipped(tmp_path, capsys):
+    raw, out = str(tmp_path / 'raw'), str(tmp_path / 'out')
+    SyntheticTrips.generateFolder(raw, 500, ['GreenPostJuly2016'])
+    #Green cab files of 2013 and 2014 have no improvement_surcharge
+    with open(os.path.join(raw, 'green_tripdata_2014-01.csv'), 'w') as f:
+        f.write('VendorID,lpep_pickup_datetime,Lpep_dropoff_datetime,Store_and_fwd_flag,RateCodeID,Pickup_longitude,Pickup_latitude,'
+                'Dropoff_longitude,Dropoff_latitude,Passenger_count,Trip_distance,Fare_amount,Extra,MTA_tax,Tip_amount,Tolls_amount,'
+                'Ehail_fee,Total_amount,Payment_type,Trip_type \n')
+    assert pending(raw, out) == ['green_tripdata_2016-07.csv']
+    assert 'green_tripdata_2014-01.csv doesn\'t match any known taxi data layout, skipping it.' in capsys.readouterr().out
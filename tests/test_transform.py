@@ -0,0 +1,26 @@
+#Vectorized transformData against the row-wise version it replaced.
+import pandas as pd
+import Baselines
+import DataAnalysis
+import SyntheticTrips
+
+def test_transform_matches_rowwise():
+    df = SyntheticTrips.syntheticAAll(400)
+    columns = ['passenger_count','trip_distance','fare_amount','week_minutes','taxi_count','carpool_count']
+    routes = 0
+    for key, group in df.groupby(DataAnalysis.routeColumns, observed = True):
+        expected = Baselines.transformDataRowwise(group.drop(DataAnalysis.routeColumns, axis = 1))
+        #Older pandas kept empty intervals as rows of zeros, which add nothing to any metric
+        expected = expected[expected['taxi_count'] > 0]
+        result = DataAnalysis.transformData(group)
+        pd.testing.assert_frame_equal(result[columns], expected[columns], check_dtype = False, check_index_type = False, check_categorical = False)
+        routes += 1
+    assert routes > 1
+
+#Datetimes other than the pickup time can't be summed, so they are left out rather than failing the aggregation.
+def test_transform_ignores_dropoff_time():
+    df = SyntheticTrips.syntheticAAll(400)
+    withDropoffs = df.assign(dropoff_datetime = df['pickup_datetime'] + pd.Timedelta(minutes = 10))
+    for window in [None, 7]:
+        pd.testing.assert_frame_equal(DataAnalysis.transformData(withDropoffs, DataAnalysis.routeColumns, window),
+                                      DataAnalysis.transformData(df, DataAnalysis.routeColumns, window))
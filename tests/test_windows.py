@@ -0,0 +1,22 @@
+#Sliding window matching against the trip by trip loop it is checked by.
+import pandas as pd
+import Baselines
+import DataAnalysis
+import SyntheticTrips
+
+def test_windows_match_loop():
+    df = SyntheticTrips.syntheticAAll(400)
+    columns = ['pickup_neighborhood','dropoff_neighborhood','pickup_datetime','passenger_count','taxi_count','carpool_count']
+    for window in [7, 60]:
+        vectorized = DataAnalysis.transformData(df, DataAnalysis.routeColumns, window).reset_index()[columns]
+        loop = Baselines.matchWindowsLoop(df, window)[columns]
+        pd.testing.assert_frame_equal(vectorized.astype({'pickup_neighborhood':str, 'dropoff_neighborhood':str}), loop, check_dtype = False)
+
+#Routes spread over too long a time for a single sort key are ordered on route and pickup time separately instead.
+def test_windows_without_sort_key(monkeypatch):
+    df = SyntheticTrips.syntheticAAll(400)
+    for window in [7, 60]:
+        expected = DataAnalysis.transformData(df, DataAnalysis.routeColumns, window)
+        monkeypatch.setattr(DataAnalysis, 'maxSortKey', 0)
+        pd.testing.assert_frame_equal(DataAnalysis.transformData(df, DataAnalysis.routeColumns, window), expected)
+        monkeypatch.undo()